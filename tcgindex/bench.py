@@ -0,0 +1,561 @@
+"""
+Benchmarks the generated endpoints in-process through the ASGI app, without a
+server or an HTTP client library.
+
+    python -m tcgindex.bench compare --requests 5000 --concurrency 64
+
+seeds a throwaway database and runs the same workload against the sync and the
+async database path. Each run gets its own interpreter, because the path is
+selected from TCGINDEX_ASYNC_MODE when the app is built.
+
+    python -m tcgindex.bench suite --scale 5x3x500x300x12 --output bench.json
+
+generates a catalog with tcgindex.datagen and drives the generated routes,
+reads first and writes after, with --requests requests per route. Throughput
+and latency percentiles per route are printed and written to --output as JSON,
+so runs can be compared. Only rows the suite created are deleted, none of them
+has children, and nothing is imported: the suite measures speed, the behavior
+of those write paths is covered by the tests.
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import itertools
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import urlencode
+
+from tcgindex import datagen
+
+COMPARE_REQUESTS = 5000
+SUITE_REQUESTS = 200
+BULK_SIZE = 100
+
+
+async def call(app, method: str, path: str, query: dict | None = None, body=None):
+    """Send one request straight to the ASGI app, return the status and body."""
+    payload = json.dumps(body).encode() if body is not None else b""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": urlencode(query or {}, doseq=True).encode(),
+        "headers": [
+            (b"host", b"bench"),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(payload)).encode()),
+        ],
+        "client": ("bench", 0),
+        "server": ("bench", 80),
+    }
+    received = False
+    status = None
+    chunks = []
+
+    async def receive():
+        nonlocal received
+        if received:
+            await asyncio.Event().wait()
+        received = True
+        return {"type": "http.request", "body": payload, "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, b"".join(chunks)
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(latencies: list[float], elapsed: float, errors: int) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "throughput": len(ordered) / elapsed,
+        "p50_ms": percentile(ordered, 0.50) * 1000,
+        "p95_ms": percentile(ordered, 0.95) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+    }
+
+
+async def run_workload(
+    app, requests: list[tuple], concurrency: int, on_response=None
+) -> dict:
+    """
+    Run (method, path, query, body) requests with bounded concurrency.
+    on_response is called with the status and body of every response.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def timed(request):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            status, body = await call(app, *request)
+            latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                errors += 1
+            if on_response is not None:
+                on_response(status, body)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(timed(request) for request in requests))
+    return summarize(latencies, time.perf_counter() - start, errors)
+
+
+def seed(cards: int):
+    from sqlmodel import Session, insert
+
+    from tcgindex.main import create_db_and_tables, engine
+    from tcgindex.models import (
+        CardRepresentation,
+        Catalog,
+        Game,
+        ProtoCard,
+        ProtoSet,
+        SetRepresentation,
+    )
+
+    create_db_and_tables()
+    with Session(engine) as session:
+        session.execute(insert(Game), [{"name": "game"}])
+        session.execute(insert(Catalog), [{"name": "catalog"}])
+        session.execute(insert(ProtoSet), [{"game_id": 1, "name": "set"}])
+        session.execute(
+            insert(SetRepresentation),
+            [
+                {
+                    "proto_set_id": 1,
+                    "catalog_id": 1,
+                    "name": "set",
+                    "identifier": "S",
+                    "size": cards,
+                }
+            ],
+        )
+        session.execute(
+            insert(ProtoCard),
+            [{"game_id": 1, "name": f"card {i}"} for i in range(cards)],
+        )
+        session.execute(
+            insert(CardRepresentation),
+            [
+                {
+                    "game_id": 1,
+                    "proto_card_id": i + 1,
+                    "set_representation_id": 1,
+                    "name": f"card {i}",
+                    "identifier": str(i),
+                }
+                for i in range(cards)
+            ],
+        )
+        session.commit()
+
+
+def read_workload(cards: int, requests: int, seed: int = 0) -> list[tuple]:
+    rng = random.Random(seed)
+    workload = []
+    for _ in range(requests):
+        if rng.random() < 0.8:
+            path = f"/card_representation/{rng.randint(1, cards)}"
+            workload.append(("GET", path, None, None))
+        else:
+            query = {"after": rng.randint(0, cards), "limit": 50}
+            workload.append(("GET", "/card_representation", query, None))
+    return workload
+
+
+def create_body(table, counts: dict[str, int], rng: random.Random, serial: int):
+    """A valid row for the table, referring to random generated parents."""
+    body = {}
+    for column in table.columns:
+        if column.primary_key or column.name in ("created_at", "updated_at"):
+            continue
+        if column.foreign_keys:
+            parent = next(iter(column.foreign_keys)).column.table.name
+            body[column.name] = rng.randint(1, counts[parent])
+        elif column.type.python_type is int:
+            body[column.name] = rng.randint(1, 500)
+        else:
+            # unique, so no unique index refuses the row
+            body[column.name] = f"bench {serial}"
+    return body
+
+
+def shared_column(table) -> str | None:
+    """A column many rows may have the same value in, for bulk updates."""
+    unique = {column.name for column in table.columns if column.unique}
+    for index in table.indexes:
+        if index.unique:
+            unique.update(column.name for column in index.columns)
+    for column in table.columns:
+        if column.primary_key or column.name in ("created_at", "updated_at"):
+            continue
+        if column.name not in unique:
+            return column.name
+    return None
+
+
+def read_workloads(db_model, counts: dict[str, int], requests: int, rng):
+    """Yield a label and the requests for every read route of a resource."""
+    from sqlalchemy import inspect
+
+    from tcgindex.cascade import CASCADE_RESOURCES
+    from tcgindex.filters import Filters
+
+    name = db_model.__tablename__
+    path = f"/{name}"
+    size = counts[name]
+    table = db_model.__table__
+
+    def repeat(request):
+        return [request() for _ in range(requests)]
+
+    # e.g. the cards of a user's collection
+    batch = min(size, 200)
+
+    def page():
+        return {"after": rng.randint(0, size), "limit": 50}
+
+    yield f"GET {path}", repeat(lambda: ("GET", path, page(), None))
+    foreign_keys = [
+        column for column in Filters(db_model).columns if table.c[column].foreign_keys
+    ]
+    if foreign_keys:
+        column = foreign_keys[0]
+        parent = next(iter(table.c[column].foreign_keys)).column.table.name
+
+        def filtered():
+            return {column: rng.randint(1, counts[parent]), "limit": 50}
+
+        yield f"GET {path}?{column}=", repeat(lambda: ("GET", path, filtered(), None))
+    yield f"GET {path}?fields=", repeat(
+        lambda: ("GET", path, {**page(), "fields": "id,name"}, None)
+    )
+    relationships = list(inspect(db_model).relationships)
+    include = next(
+        (relationship.key for relationship in relationships if relationship.uselist),
+        relationships[0].key if relationships else None,
+    )
+    if include is not None:
+        yield f"GET {path}?include={include}", repeat(
+            lambda: ("GET", path, {**page(), "limit": 10, "include": include}, None)
+        )
+    yield f"GET {path}?count=true", repeat(
+        lambda: ("GET", path, {**page(), "count": "true"}, None)
+    )
+    yield f"HEAD {path}", repeat(lambda: ("HEAD", path, None, None))
+    # the generated rows are the whole change log, one entry each
+    changes = sum(counts.values())
+    yield f"GET {path}/changes", repeat(
+        lambda: (
+            "GET",
+            path + "/changes",
+            {"since": rng.randint(0, changes), "limit": 50},
+            None,
+        )
+    )
+    # every row, far fewer requests than for a page
+    yield f"GET {path}/export", [
+        ("GET", path + "/export", None, None) for _ in range(max(1, requests // 100))
+    ]
+    if foreign_keys:
+        yield f"GET {path}/export?{column}=", [
+            ("GET", path + "/export", filtered(), None)
+            for _ in range(max(1, requests // 10))
+        ]
+    yield f"POST {path}/batch_get", repeat(
+        lambda: (
+            "POST",
+            path + "/batch_get",
+            None,
+            rng.sample(range(1, size + 1), batch),
+        )
+    )
+    yield f"GET {path}/{{id}}", repeat(
+        lambda: ("GET", f"{path}/{rng.randint(1, size)}", None, None)
+    )
+    if name in CASCADE_RESOURCES:
+        # counts the subtree without deleting it
+        yield f"DELETE {path}/cascade?dry_run=true", repeat(
+            lambda: (
+                "DELETE",
+                path + "/cascade",
+                {"dry_run": "true"},
+                [rng.randint(1, size)],
+            )
+        )
+    if name == "set_representation":
+        yield f"GET {path}/{{id}}/full", repeat(
+            lambda: ("GET", f"{path}/{rng.randint(1, size)}/full", None, None)
+        )
+
+
+async def run_suite(app, counts: dict[str, int], requests: int, concurrency: int):
+    from tcgindex.cascade import CASCADE_RESOURCES
+
+    results = {}
+
+    async def run(label, workload, on_response=None):
+        print(label, file=sys.stderr)
+        results[label] = await run_workload(app, workload, concurrency, on_response)
+
+    for db_model in datagen.WRITE_ORDER:
+        rng = random.Random(db_model.__tablename__)
+        for label, workload in read_workloads(db_model, counts, requests, rng):
+            await run(label, workload)
+    rng = random.Random("changes")
+    changes = sum(counts.values())
+    await run(
+        "GET /changes",
+        [
+            ("GET", "/changes", {"since": rng.randint(0, changes), "limit": 50}, None)
+            for _ in range(requests)
+        ],
+    )
+    # writes run after every read, so the reads see the generated data only
+    for db_model in datagen.WRITE_ORDER:
+        name = db_model.__tablename__
+        path = f"/{name}"
+        rng = random.Random(name)
+        serial = itertools.count()
+        created = []
+        bulk_created = []
+
+        def collect(status, body):
+            if status == 200:
+                created.append(json.loads(body)["id"])
+
+        def collect_bulk(status, body):
+            if status == 200:
+                bulk_created.extend(json.loads(body)["ids"])
+
+        def row():
+            return create_body(db_model.__table__, counts, rng, next(serial))
+
+        await run(
+            f"POST {path}",
+            [("POST", path, None, row()) for _ in range(requests)],
+            collect,
+        )
+        await run(
+            f"POST {path}/bulk",
+            [
+                ("POST", path + "/bulk", None, [row() for _ in range(BULK_SIZE)])
+                for _ in range(max(1, requests // 10))
+            ],
+            collect_bulk,
+        )
+        await run(
+            f"PATCH {path}/{{id}}",
+            [
+                ("PATCH", f"{path}/{rng.randint(1, counts[name])}", None, row())
+                for _ in range(requests)
+            ],
+        )
+        column = shared_column(db_model.__table__)
+        if column is not None:
+            batch = min(counts[name], BULK_SIZE)
+
+            def patch():
+                ids = rng.sample(range(1, counts[name] + 1), batch)
+                return {"ids": ids, "patch": {column: row()[column]}}
+
+            await run(
+                f"PATCH {path}/bulk",
+                [
+                    ("PATCH", path + "/bulk", None, patch())
+                    for _ in range(max(1, requests // 10))
+                ],
+            )
+        # only rows created above are deleted, they have no children
+        if name in CASCADE_RESOURCES:
+            # every other row is left to the cascade delete
+            created, cascaded = created[::2], created[1::2]
+            await run(
+                f"DELETE {path}/cascade",
+                [("DELETE", path + "/cascade", None, [id]) for id in cascaded],
+            )
+        await run(
+            f"DELETE {path}/{{id}}",
+            [("DELETE", f"{path}/{id}", None, None) for id in created],
+        )
+        await run(
+            f"DELETE {path}/bulk",
+            [
+                (
+                    "DELETE",
+                    path + "/bulk",
+                    None,
+                    bulk_created[start : start + BULK_SIZE],
+                )
+                for start in range(0, len(bulk_created), BULK_SIZE)
+            ],
+        )
+    return results
+
+
+def worker(args):
+    if args.worker == "seed":
+        seed(args.cards)
+        return
+    if args.worker == "generate":
+        from tcgindex.main import create_db_and_tables, engine
+
+        create_db_and_tables()
+        datagen.write(engine, datagen.Scale.parse(args.scale, args.seed))
+        # checkpoints the WAL into the database file before it is copied
+        engine.dispose()
+        return
+    from tcgindex.main import app
+
+    if args.worker == "suite":
+        from tcgindex.counts import row_count
+        from tcgindex.main import engine
+
+        with engine.connect() as connection:
+            counts = {
+                model.__tablename__: row_count(connection, model.__tablename__)
+                for model in datagen.WRITE_ORDER
+            }
+        routes = asyncio.run(run_suite(app, counts, args.requests, args.concurrency))
+        print(json.dumps({"counts": counts, "routes": routes}))
+        return
+    workload = read_workload(args.cards, args.requests)
+    result = asyncio.run(run_workload(app, workload, args.concurrency))
+    print(json.dumps(result))
+
+
+def compare(args):
+    with tempfile.TemporaryDirectory() as directory:
+        environ = dict(
+            os.environ, TCGINDEX_DATABASE_URL=f"sqlite:///{directory}/bench.db"
+        )
+        command = [sys.executable, "-m", "tcgindex.bench", *sys.argv[1:]]
+        subprocess.run(command + ["--worker", "seed"], env=environ, check=True)
+        results = {}
+        for mode in ("sync", "async"):
+            environ["TCGINDEX_ASYNC_MODE"] = "1" if mode == "async" else "0"
+            output = subprocess.run(
+                command + ["--worker", "run"],
+                env=environ,
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            results[mode] = json.loads(output)
+    for mode, result in results.items():
+        print(
+            f"{mode:>5}: {result['throughput']:8.1f} req/s  "
+            f"p50 {result['p50_ms']:6.2f} ms  p95 {result['p95_ms']:6.2f} ms  "
+            f"p99 {result['p99_ms']:6.2f} ms  errors {result['errors']}"
+        )
+
+
+def suite(args):
+    scale = datagen.Scale.parse(args.scale, args.seed)
+    modes = ("sync", "async") if args.mode == "both" else (args.mode,)
+    report = {
+        "scale": dataclasses.asdict(scale),
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "runs": {},
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        generated = f"{directory}/generated.db"
+        environ = dict(os.environ, TCGINDEX_DATABASE_URL=f"sqlite:///{generated}")
+        command = [sys.executable, "-m", "tcgindex.bench", *sys.argv[1:]]
+        subprocess.run(command + ["--worker", "generate"], env=environ, check=True)
+        for mode in modes:
+            # every mode starts from a copy of the same generated database,
+            # the writes of one run do not leak into the next
+            database = f"{directory}/{mode}.db"
+            shutil.copyfile(generated, database)
+            environ["TCGINDEX_DATABASE_URL"] = f"sqlite:///{database}"
+            environ["TCGINDEX_ASYNC_MODE"] = "1" if mode == "async" else "0"
+            output = subprocess.run(
+                command + ["--worker", "suite"],
+                env=environ,
+                check=True,
+                stdout=subprocess.PIPE,
+                text=True,
+            ).stdout
+            report["runs"][mode] = json.loads(output)
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    for mode, run in report["runs"].items():
+        print(mode)
+        for label, result in run["routes"].items():
+            print(
+                f"  {label:<52} {result['throughput']:8.1f} req/s  "
+                f"p50 {result['p50_ms']:7.2f} ms  p95 {result['p95_ms']:7.2f} ms  "
+                f"p99 {result['p99_ms']:7.2f} ms  errors {result['errors']}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m tcgindex.bench")
+    parser.add_argument("command", choices=["compare", "suite"])
+    parser.add_argument("--cards", type=int, default=2000)
+    parser.add_argument(
+        "--requests",
+        type=int,
+        help=f"defaults to {COMPARE_REQUESTS}, "
+        f"or {SUITE_REQUESTS} per route for the suite",
+    )
+    parser.add_argument("--concurrency", type=int, default=64)
+    # suite only
+    parser.add_argument(
+        "--scale",
+        default="2x2x20x100x4",
+        help="games x catalogs x sets x cards x locales",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mode", choices=["sync", "async", "both"], default="both")
+    parser.add_argument("--output", default="bench.json")
+    parser.add_argument(
+        "--worker",
+        choices=["seed", "run", "generate", "suite"],
+        help=argparse.SUPPRESS,
+    )
+    args = parser.parse_args()
+    if args.requests is None:
+        args.requests = (
+            COMPARE_REQUESTS if args.command == "compare" else SUITE_REQUESTS
+        )
+    try:
+        datagen.Scale.parse(args.scale, args.seed)
+    except ValueError as exc:
+        parser.error(str(exc))
+    if args.worker:
+        worker(args)
+    elif args.command == "suite":
+        suite(args)
+    else:
+        compare(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import dataclasses
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+from fastapi import Response
+
+from tcgindex.etags import etag_matches
+
+
+@dataclasses.dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    etag: str
+
+    def to_response(self, if_none_match: str | None = None) -> Response:
+        if etag_matches(if_none_match, self.etag):
+            return Response(status_code=304, headers={"ETag": self.etag})
+        return Response(
+            content=self.body,
+            media_type="application/json",
+            headers={"ETag": self.etag},
+        )
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache of encoded responses with an optional time to live.
+
+    Every invalidation bumps the generation. A reader captures the generation
+    before querying the database and passes it to set(), so a response computed
+    while a write was being committed is never stored.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries: OrderedDict[Hashable, tuple[float, CachedResponse]] = (
+            OrderedDict()
+        )
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> CachedResponse | None:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and self.ttl is not None:
+                if time.monotonic() - entry[0] > self.ttl:
+                    del self.entries[key]
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: CachedResponse, generation: int):
+        with self.lock:
+            if generation != self.generation:
+                return
+            self.entries[key] = (time.monotonic(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def discard(self, predicate: Callable[[Hashable], bool]):
+        with self.lock:
+            self.generation += 1
+            for key in [key for key in self.entries if predicate(key)]:
+                del self.entries[key]
+
+    def stats(self) -> dict[str, int]:
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+            }
@@ -0,0 +1,98 @@
+"""
+Set-based cascading deletes for the representation hierarchy, e.g. a catalog
+with its sets, their localized names, cards and the cards' localized names.
+
+The rows below the deleted ones are found by following the foreign keys that
+refer to each table, so every table costs one DELETE per chunk of ids, whose
+WHERE clause nests the selection of the parent rows:
+
+    DELETE FROM localized_card_name WHERE card_representation_id IN (
+        SELECT id FROM card_representation WHERE set_representation_id IN (
+            SELECT id FROM set_representation WHERE catalog_id IN (...)))
+
+The tables are deleted from the deepest up, so the parent rows a clause selects
+through still exist when it runs. Every foreign key followed here leads an
+index, so each statement seeks instead of scanning.
+"""
+
+import dataclasses
+
+from sqlalchemy import Column, Connection, Table, delete, func, select
+from sqlmodel import SQLModel
+
+from tcgindex.database import chunked
+
+CASCADE_RESOURCES = (
+    "catalog",
+    "proto_set",
+    "set_representation",
+    "card_representation",
+)
+
+
+@dataclasses.dataclass(frozen=True)
+class Level:
+    table: Table
+    # the column referring to the parent level, None for the deleted table
+    column: Column | None
+    parent: int | None
+
+
+class Cascade:
+    def __init__(self, table: Table):
+        self.levels = [Level(table, None, None)]
+        seen = {table.name}
+        for index, level in enumerate(self.levels):
+            for child in SQLModel.metadata.sorted_tables:
+                for foreign_key in child.foreign_keys:
+                    if foreign_key.column.table is not level.table:
+                        continue
+                    if child.name in seen:
+                        continue
+                    seen.add(child.name)
+                    self.levels.append(Level(child, foreign_key.parent, index))
+
+    @property
+    def table(self) -> Table:
+        return self.levels[0].table
+
+    def clauses(self, ids: list[int]) -> list:
+        """The WHERE clause selecting the rows of every level under the ids."""
+        clauses = []
+        for level in self.levels:
+            if level.parent is None:
+                clauses.append(level.table.c.id.in_(ids))
+                continue
+            parent = self.levels[level.parent]
+            selection = select(parent.table.c.id).where(clauses[level.parent])
+            clauses.append(level.column.in_(selection))
+        return clauses
+
+    def missing(self, connection: Connection, ids: list[int]) -> list[int]:
+        found = set()
+        for chunk in chunked(ids):
+            statement = select(self.table.c.id).where(self.table.c.id.in_(chunk))
+            found.update(connection.execute(statement).scalars())
+        return [id for id in ids if id not in found]
+
+    def count(self, connection: Connection, ids: list[int]) -> dict[str, int]:
+        counts = {level.table.name: 0 for level in self.levels}
+        for chunk in chunked(ids):
+            for level, clause in zip(self.levels, self.clauses(chunk)):
+                statement = select(func.count()).select_from(level.table).where(clause)
+                counts[level.table.name] += connection.execute(statement).scalar_one()
+        return counts
+
+    def delete(self, connection: Connection, ids: list[int]) -> dict[str, list[int]]:
+        """Delete the rows and everything below them, return the deleted ids."""
+        deleted = {level.table.name: [] for level in self.levels}
+        for chunk in chunked(ids):
+            pairs = list(zip(self.levels, self.clauses(chunk)))
+            for level, clause in reversed(pairs):
+                statement = (
+                    delete(level.table).where(clause).returning(level.table.c.id)
+                )
+                deleted[level.table.name].extend(
+                    connection.execute(statement).scalars()
+                )
+        return deleted
@@ -0,0 +1,165 @@
+"""
+Change feed for downstream sync, e.g. GET /card_representation/changes?since=0
+or GET /changes?since=0 across every table.
+
+Triggers on every table write the table name, row id and action to a log with
+an AUTOINCREMENT sequence number. A row keeps only its latest entry, so the log
+holds one entry per live row plus a tombstone per deleted row, and a consumer
+that resumes from the last sequence number it saw gets every row that changed
+since then exactly once. sqlite serializes writers, so the sequence numbers
+become visible in order and no change can appear behind a cursor.
+"""
+
+import datetime
+from typing import Iterator
+
+from sqlalchemy import Connection, column, event, select, table
+from sqlmodel import SQLModel
+
+from tcgindex.database import chunked
+from tcgindex.models import Change, PublicModel
+
+CHANGE_TABLE = "change_log"
+ACTIONS = {
+    "INSERT": ("new", "create"),
+    "UPDATE": ("new", "update"),
+    "DELETE": ("old", "delete"),
+}
+
+change_log = table(
+    CHANGE_TABLE,
+    column("seq"),
+    column("table_name"),
+    column("row_id"),
+    column("action"),
+    column("changed_at"),
+)
+public_models: dict[str, tuple[type[SQLModel], type[PublicModel]]] = {}
+
+
+def ddl_statements(tables: list[str]) -> list[str]:
+    statements = [
+        f"CREATE TABLE IF NOT EXISTS {CHANGE_TABLE} "
+        "(seq INTEGER PRIMARY KEY AUTOINCREMENT, table_name VARCHAR NOT NULL, "
+        "row_id INTEGER NOT NULL, action VARCHAR NOT NULL, "
+        "changed_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP)",
+        # finds the previous entry of a row
+        f"CREATE UNIQUE INDEX IF NOT EXISTS ix_{CHANGE_TABLE}_table_name_row_id "
+        f"ON {CHANGE_TABLE}(table_name, row_id)",
+        # the feed of a single table
+        f"CREATE INDEX IF NOT EXISTS ix_{CHANGE_TABLE}_table_name_seq "
+        f"ON {CHANGE_TABLE}(table_name, seq)",
+    ]
+    for name in tables:
+        for operation, (row, action) in ACTIONS.items():
+            # a delete and an insert rather than INSERT OR REPLACE, an outer
+            # INSERT OR IGNORE would override the conflict clause of the trigger
+            statements.append(
+                f"CREATE TRIGGER IF NOT EXISTS {CHANGE_TABLE}_{name}_"
+                f"{operation.lower()} AFTER {operation} ON {name} BEGIN "
+                f"DELETE FROM {CHANGE_TABLE} "
+                f"WHERE table_name = '{name}' AND row_id = {row}.id; "
+                f"INSERT INTO {CHANGE_TABLE}(table_name, row_id, action) "
+                f"VALUES ('{name}', {row}.id, '{action}'); END"
+            )
+    return statements
+
+
+def install(connection: Connection):
+    exists = connection.exec_driver_sql(
+        f"SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = '{CHANGE_TABLE}'"
+    ).first()
+    tables = [table.name for table in SQLModel.metadata.sorted_tables]
+    for statement in ddl_statements(tables):
+        connection.exec_driver_sql(statement)
+    if exists is None:
+        # rows written before the log existed are listed as created
+        for name in tables:
+            connection.exec_driver_sql(
+                f"INSERT INTO {CHANGE_TABLE}(table_name, row_id, action) "
+                f"SELECT '{name}', id, 'create' FROM {name} ORDER BY id"
+            )
+
+
+@event.listens_for(SQLModel.metadata, "after_create")
+def create_change_log(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        install(connection)
+
+
+def register(db_model: type[SQLModel], public_model: type[PublicModel]):
+    public_models[db_model.__tablename__] = (db_model, public_model)
+
+
+def current_rows(connection: Connection, name: str, ids: list[int]) -> dict:
+    db_model, public_model = public_models[name]
+    columns = [db_model.__table__.c[field] for field in public_model.model_fields]
+    rows = {}
+    for chunk in chunked(ids):
+        statement = select(*columns).where(db_model.__table__.c.id.in_(chunk))
+        for row in connection.execute(statement).mappings():
+            rows[row["id"]] = public_model.model_validate(dict(row))
+    return rows
+
+
+def read_changes(
+    connection: Connection, name: str | None, since: int, limit: int
+) -> tuple[list[Change], bool]:
+    """Return the changes after since, oldest first, and whether there are more."""
+    statement = (
+        select(
+            change_log.c.seq,
+            change_log.c.table_name,
+            change_log.c.row_id,
+            change_log.c.action,
+            change_log.c.changed_at,
+        )
+        .where(change_log.c.seq > since)
+        .order_by(change_log.c.seq)
+        .limit(limit + 1)
+    )
+    if name is not None:
+        statement = statement.where(change_log.c.table_name == name)
+    entries = connection.execute(statement).all()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    ids: dict[str, list[int]] = {}
+    for entry in entries:
+        if entry.action != "delete":
+            ids.setdefault(entry.table_name, []).append(entry.row_id)
+    rows = {name: current_rows(connection, name, ids) for name, ids in ids.items()}
+    changes = []
+    for entry in entries:
+        row = rows.get(entry.table_name, {}).get(entry.row_id)
+        # a row deleted after the log was read is reported as deleted, its
+        # tombstone follows later in the feed
+        action = entry.action if row is not None else "delete"
+        changes.append(
+            Change(
+                seq=entry.seq,
+                table=entry.table_name,
+                id=entry.row_id,
+                action=action,
+                # CURRENT_TIMESTAMP is in UTC
+                changed_at=datetime.datetime.fromisoformat(
+                    str(entry.changed_at)
+                ).replace(tzinfo=datetime.timezone.utc),
+                row=row,
+            )
+        )
+    return changes, has_more
+
+
+def stream_changes(
+    engine, name: str | None, since: int, chunk_size: int
+) -> Iterator[list[Change]]:
+    """Yield every change after since, one short read per chunk."""
+    while True:
+        with engine.connect() as connection:
+            changes, has_more = read_changes(connection, name, since, chunk_size)
+        if changes:
+            yield changes
+            since = changes[-1].seq
+        if not has_more:
+            return
@@ -0,0 +1,96 @@
+import threading
+from collections import OrderedDict
+from typing import Hashable
+
+from sqlalchemy import Connection, Table, event, func, select, text
+from sqlmodel import SQLModel
+
+from tcgindex.etags import table_version
+
+COUNT_TABLE = "row_count"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+FILTERED_CACHE_SIZE = 1024
+
+
+def ddl_statements(tables: list[str]) -> list[str]:
+    statements = [
+        f"CREATE TABLE IF NOT EXISTS {COUNT_TABLE} "
+        "(name VARCHAR PRIMARY KEY, count INTEGER NOT NULL DEFAULT 0)"
+    ]
+    for table in tables:
+        # tables that already hold rows are counted once, when the counter is
+        # created, and kept current by the triggers from then on
+        statements.append(
+            f"INSERT INTO {COUNT_TABLE}(name, count) "
+            f"SELECT '{table}', (SELECT COUNT(*) FROM {table}) "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {COUNT_TABLE} WHERE name = '{table}')"
+        )
+        for operation, change in (("INSERT", "+ 1"), ("DELETE", "- 1")):
+            statements.append(
+                f"CREATE TRIGGER IF NOT EXISTS {COUNT_TABLE}_{table}_"
+                f"{operation.lower()} AFTER {operation} ON {table} BEGIN "
+                f"UPDATE {COUNT_TABLE} SET count = count {change} "
+                f"WHERE name = '{table}'; END"
+            )
+    return statements
+
+
+def install(connection: Connection):
+    tables = [table.name for table in SQLModel.metadata.sorted_tables]
+    for statement in ddl_statements(tables):
+        connection.exec_driver_sql(statement)
+
+
+@event.listens_for(SQLModel.metadata, "after_create")
+def create_count_table(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        install(connection)
+
+
+def row_count(connection: Connection, name: str) -> int:
+    return connection.execute(
+        text(f"SELECT count FROM {COUNT_TABLE} WHERE name = :name"), {"name": name}
+    ).scalar_one()
+
+
+class FilteredCounts:
+    """
+    Bounded LRU of filtered row counts keyed by the table version. A write
+    bumps the version, so a stale count is never read again and ages out.
+    """
+
+    def __init__(self, maxsize: int = FILTERED_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.entries: OrderedDict[Hashable, int] = OrderedDict()
+
+    def count(
+        self, connection: Connection, table: Table, clauses: list, key: Hashable
+    ) -> int:
+        # the version is read before the rows, like the collection etags
+        key = (table.name, table_version(connection, table.name), key)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+        # the filters only use indexed columns, so the count is answered from
+        # the index without reading the rows
+        statement = select(func.count()).select_from(table).where(*clauses)
+        count = connection.execute(statement).scalar_one()
+        with self.lock:
+            self.entries[key] = count
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return count
+
+
+filtered_counts = FilteredCounts()
+
+
+def total_count(
+    connection: Connection, table: Table, clauses: list, key: Hashable
+) -> int:
+    """The number of rows matching the filters, without a full table scan."""
+    if not clauses:
+        return row_count(connection, table.name)
+    return filtered_counts.count(connection, table, clauses, key)
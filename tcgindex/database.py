@@ -0,0 +1,161 @@
+import dataclasses
+import os
+from typing import Mapping
+
+from sqlalchemy import URL, Engine, MetaData, event, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel import create_engine
+
+ENV_PREFIX = "TCGINDEX_"
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite"}
+# stays well below SQLITE_MAX_VARIABLE_NUMBER, which is 999 before sqlite 3.32
+IN_CHUNK_SIZE = 500
+
+
+@dataclasses.dataclass(frozen=True)
+class Settings:
+    """
+    Engine settings. Every field can be overridden from the environment with the
+    upper-cased field name prefixed by TCGINDEX_, e.g. TCGINDEX_DATABASE_URL.
+    """
+
+    # sqlite only, table versions, row counts, the change log, set snapshots
+    # and the search index are kept by sqlite triggers
+    database_url: str = "sqlite:///database.db"
+    echo: bool = False
+    # serve the generated CRUD endpoints through an AsyncEngine, which needs
+    # aiosqlite from the async extra
+    async_mode: bool = False
+    # encode full rows of the generated read endpoints straight from row
+    # tuples instead of validating ORM instances through the public models
+    fast_serialization: bool = False
+    # per-route request metrics and SQL statement counts on /metrics
+    metrics: bool = True
+    pool_size: int = 5
+    max_overflow: int = 10
+    # sqlite only
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    mmap_size: int = 256 * 1024 * 1024
+    # negative values are KiB rather than pages
+    cache_size: int = -64 * 1024
+    busy_timeout: int = 5000
+
+    @classmethod
+    def from_env(cls, environ: Mapping[str, str] = os.environ) -> "Settings":
+        overrides = {}
+        for field in dataclasses.fields(cls):
+            value = environ.get(ENV_PREFIX + field.name.upper())
+            if value is None:
+                continue
+            if field.type is bool:
+                overrides[field.name] = value.lower() in ("1", "true", "yes", "on")
+            elif field.type is int:
+                overrides[field.name] = int(value)
+            else:
+                overrides[field.name] = value
+        return cls(**overrides)
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record, settings: Settings):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.journal_mode}")
+    cursor.execute(f"PRAGMA synchronous={settings.synchronous}")
+    cursor.execute(f"PRAGMA mmap_size={settings.mmap_size:d}")
+    cursor.execute(f"PRAGMA cache_size={settings.cache_size:d}")
+    cursor.execute(f"PRAGMA busy_timeout={settings.busy_timeout:d}")
+    cursor.close()
+
+
+def sqlite_file(url: URL) -> str | None:
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+        return None
+    return url.database
+
+
+def chunked(values: list, size: int = IN_CHUNK_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start : start + size]
+
+
+def engine_options(settings: Settings, url: URL) -> dict:
+    options = {"echo": settings.echo}
+    # in-memory sqlite databases use a single connection per thread, pool
+    # sizing only applies to database files
+    if sqlite_file(url):
+        options.update(pool_size=settings.pool_size, max_overflow=settings.max_overflow)
+    return options
+
+
+def install_pragmas(engine: Engine, settings: Settings):
+    @event.listens_for(engine, "connect")
+    def connect(dbapi_connection, connection_record):
+        set_sqlite_pragmas(dbapi_connection, connection_record, settings)
+
+
+def create_configured_engine(settings: Settings) -> Engine:
+    url = make_url(settings.database_url)
+    engine = create_engine(url, **engine_options(settings, url))
+    install_pragmas(engine, settings)
+    return engine
+
+
+def create_configured_async_engine(settings: Settings) -> AsyncEngine:
+    url = make_url(settings.database_url)
+    url = url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()])
+    engine = create_async_engine(url, **engine_options(settings, url))
+    install_pragmas(engine.sync_engine, settings)
+    return engine
+
+
+def create_missing_indexes(engine: Engine, metadata: MetaData):
+    with engine.begin() as connection:
+        for table in metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+        if engine.dialect.name == "sqlite":
+            connection.exec_driver_sql("ANALYZE")
+
+
+_settings: Settings | None = None
+_engine: Engine | None = None
+_async_engine: AsyncEngine | None = None
+
+
+def configure_engine(settings: Settings | None = None) -> Engine:
+    """
+    Create the engine from the settings, by default those of the environment.
+
+    Call it before tcgindex.main is imported: the app takes the engine, the
+    async engine and the settings its routes depend on when it is imported,
+    and keeps using them if the engine is configured again afterwards.
+    """
+    global _settings, _engine, _async_engine
+    settings = settings or Settings.from_env()
+    backend = make_url(settings.database_url).get_backend_name()
+    if backend != "sqlite":
+        raise ValueError(f"only sqlite databases are supported, not {backend}")
+    if _engine is not None:
+        _engine.dispose()
+    _settings = settings
+    _engine = create_configured_engine(_settings)
+    _async_engine = None
+    return _engine
+
+
+def get_engine() -> Engine:
+    if _engine is None:
+        return configure_engine()
+    return _engine
+
+
+def get_settings() -> Settings:
+    get_engine()
+    return _settings
+
+
+def get_async_engine() -> AsyncEngine:
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_configured_async_engine(get_settings())
+    return _async_engine
@@ -0,0 +1,283 @@
+"""
+Deterministic synthetic catalogs for benchmarks.
+
+    python -m tcgindex.datagen --games 5 --catalogs 3 --sets 500 --cards 300 --locales 12
+
+recreates the configured database and fills it with games, each with its own
+catalogs and sets. Every set is printed in each catalog of its game, with its
+cards and their localized names. Set sizes vary around --cards and not every card
+is translated into every locale, like real catalogs. The same scale and seed
+always produce the same rows and ids.
+"""
+
+import argparse
+import dataclasses
+import random
+import sys
+import time
+
+from sqlalchemy import Engine, insert
+from sqlmodel import SQLModel
+
+from tcgindex.models import (
+    CardRepresentation,
+    Catalog,
+    Game,
+    LocalizedCardName,
+    LocalizedSetName,
+    ProtoCard,
+    ProtoSet,
+    SetRepresentation,
+)
+
+LOCALES = (
+    "en",
+    "de",
+    "fr",
+    "it",
+    "es",
+    "pt",
+    "ja",
+    "ko",
+    "zh-Hans",
+    "zh-Hant",
+    "ru",
+    "pl",
+    "nl",
+    "sv",
+    "tr",
+    "th",
+)
+SYLLABLES = (
+    "ka",
+    "ri",
+    "to",
+    "mel",
+    "dor",
+    "an",
+    "vex",
+    "su",
+    "lin",
+    "gor",
+    "ae",
+    "th",
+    "qua",
+    "zel",
+    "mor",
+    "ith",
+    "bra",
+    "nu",
+    "sha",
+    "ko",
+)
+CATALOG_KINDS = ("Retail", "Promo", "Online", "Collector", "Starter", "Tournament")
+# parents first, so every batch only refers to rows that are already written
+WRITE_ORDER = (
+    Game,
+    Catalog,
+    ProtoSet,
+    ProtoCard,
+    SetRepresentation,
+    LocalizedSetName,
+    CardRepresentation,
+    LocalizedCardName,
+)
+# the share of cards translated into each locale after the first
+TRANSLATED = 0.8
+
+
+@dataclasses.dataclass(frozen=True)
+class Scale:
+    games: int = 2
+    # per game
+    catalogs: int = 2
+    # per game, each printed in every catalog of the game
+    sets: int = 20
+    # the mean number of cards per set
+    cards: int = 100
+    locales: int = 4
+    seed: int = 0
+
+    def __post_init__(self):
+        if not 1 <= self.locales <= len(LOCALES):
+            raise ValueError(f"locales must be between 1 and {len(LOCALES)}")
+
+    @classmethod
+    def parse(cls, text: str, seed: int = 0) -> "Scale":
+        """Parse games x catalogs x sets x cards x locales, e.g. 5x3x500x300x12."""
+        try:
+            games, catalogs, sets, cards, locales = map(int, text.lower().split("x"))
+        except ValueError:
+            raise ValueError(
+                f"{text} is not games x catalogs x sets x cards x locales"
+            ) from None
+        return cls(games, catalogs, sets, cards, locales, seed)
+
+
+def word(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).title()
+
+
+def phrase(rng: random.Random, words: int) -> str:
+    return " ".join(word(rng) for _ in range(words))
+
+
+class Generator:
+    """
+    Yields the rows of a synthetic catalog in batches of about batch_size
+    rows. Ids are assigned here, so they are the same on every run
+    and the rows of a table are numbered 1 to counts[table].
+    """
+
+    def __init__(self, scale: Scale, batch_size: int = 5000):
+        self.scale = scale
+        self.batch_size = batch_size
+        self.counts = {model.__tablename__: 0 for model in WRITE_ORDER}
+        self.rows: dict[type[SQLModel], list[dict]] = {
+            model: [] for model in WRITE_ORDER
+        }
+        self.locales = LOCALES[: scale.locales]
+        self.game_names = set()
+
+    def add(self, model: type[SQLModel], **row) -> int:
+        table = model.__tablename__
+        self.counts[table] += 1
+        row["id"] = self.counts[table]
+        self.rows[model].append(row)
+        return row["id"]
+
+    def pending(self) -> int:
+        return sum(len(rows) for rows in self.rows.values())
+
+    def flush(self):
+        batch = [(model, self.rows[model]) for model in WRITE_ORDER if self.rows[model]]
+        self.rows = {model: [] for model in WRITE_ORDER}
+        return batch
+
+    def localized(self, rng: random.Random, model, parent: str, id: int, name: str):
+        for index, locale in enumerate(self.locales):
+            if index == 0:
+                translated = name
+            elif rng.random() < TRANSLATED:
+                translated = phrase(rng, name.count(" ") + 1)
+            else:
+                continue
+            self.add(model, **{parent: id}, locale=locale, name=translated)
+
+    def batches(self):
+        scale = self.scale
+        for game in range(scale.games):
+            rng = random.Random(f"{scale.seed}:{game}")
+            # catalog names are unique and start with the game's name
+            game_name = phrase(rng, 2)
+            while game_name in self.game_names:
+                game_name = phrase(rng, 2)
+            self.game_names.add(game_name)
+            game_id = self.add(Game, name=game_name)
+            catalog_ids = [
+                self.add(
+                    Catalog,
+                    name=f"{game_name} {CATALOG_KINDS[index % len(CATALOG_KINDS)]} "
+                    f"{index // len(CATALOG_KINDS) + 1}",
+                )
+                for index in range(scale.catalogs)
+            ]
+            for number in range(scale.sets):
+                # every set gets its own random stream, so its rows do not
+                # depend on how many sets or cards were generated before it
+                rng = random.Random(f"{scale.seed}:{game}:{number}")
+                set_name = phrase(rng, rng.randint(1, 3))
+                proto_set_id = self.add(ProtoSet, game_id=game_id, name=set_name)
+                size = max(1, round(rng.uniform(0.5, 1.5) * scale.cards))
+                proto_cards = []
+                for _ in range(size):
+                    card_name = phrase(rng, rng.randint(1, 3))
+                    proto_card_id = self.add(ProtoCard, game_id=game_id, name=card_name)
+                    proto_cards.append((proto_card_id, card_name))
+                for catalog_id in catalog_ids:
+                    set_id = self.add(
+                        SetRepresentation,
+                        proto_set_id=proto_set_id,
+                        catalog_id=catalog_id,
+                        name=set_name,
+                        identifier=f"{game + 1}-{number + 1:04d}",
+                        size=size,
+                    )
+                    self.localized(
+                        rng, LocalizedSetName, "set_representation_id", set_id, set_name
+                    )
+                    for index, (proto_card_id, card_name) in enumerate(proto_cards):
+                        card_id = self.add(
+                            CardRepresentation,
+                            game_id=game_id,
+                            proto_card_id=proto_card_id,
+                            set_representation_id=set_id,
+                            name=card_name,
+                            identifier=str(index + 1),
+                        )
+                        self.localized(
+                            rng,
+                            LocalizedCardName,
+                            "card_representation_id",
+                            card_id,
+                            card_name,
+                        )
+                    if self.pending() >= self.batch_size:
+                        yield self.flush()
+        if self.pending():
+            yield self.flush()
+
+
+def write(engine: Engine, scale: Scale, batch_size: int = 5000, progress=None):
+    """Insert a generated catalog, return the number of rows per table."""
+    generator = Generator(scale, batch_size)
+    for batch in generator.batches():
+        with engine.begin() as connection:
+            for model, rows in batch:
+                connection.execute(insert(model.__table__), rows)
+        if progress is not None:
+            progress(generator.counts)
+    return generator.counts
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m tcgindex.datagen")
+    defaults = Scale()
+    for field in dataclasses.fields(Scale):
+        parser.add_argument(
+            f"--{field.name}", type=int, default=getattr(defaults, field.name)
+        )
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+    try:
+        scale = Scale(
+            **{
+                field.name: getattr(args, field.name)
+                for field in dataclasses.fields(Scale)
+            }
+        )
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    from tcgindex.main import create_db_and_tables, engine
+
+    create_db_and_tables()
+    start = time.perf_counter()
+
+    def progress(counts):
+        print(
+            f"\r{counts['card_representation']} cards, "
+            f"{counts['localized_card_name']} card names",
+            end="",
+            file=sys.stderr,
+        )
+
+    counts = write(engine, scale, args.batch_size, progress)
+    print(file=sys.stderr)
+    for table, count in counts.items():
+        print(f"{table:>20}: {count}")
+    print(f"{time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
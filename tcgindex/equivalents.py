@@ -0,0 +1,176 @@
+import threading
+from collections import defaultdict
+from typing import Annotated
+
+from fastapi import HTTPException
+from pydantic import BaseModel, Field
+from sqlalchemy import Connection, func, select
+
+from tcgindex.changes import change_log
+from tcgindex.database import chunked, get_engine
+from tcgindex.models import CardRepresentation, SetRepresentation
+
+MAX_BATCH_SIZE = 10000
+# beyond this many changes since the last read the index is loaded again
+MAX_CATCH_UP = 10000
+SOURCES = ("card_representation", "set_representation")
+
+
+class Equivalent(BaseModel):
+    card_representation_id: int
+    catalog_id: int
+
+
+class CardEquivalents(BaseModel):
+    card_representation_id: int
+    proto_card_id: int
+    catalog_id: int
+    equivalents: list[Equivalent]
+
+
+class EquivalentsRequest(BaseModel):
+    ids: Annotated[list[int], Field(max_length=MAX_BATCH_SIZE)]
+    catalog_id: int | None = None
+
+
+class EquivalentsBatch(BaseModel):
+    items: list[CardEquivalents]
+    missing: list[int]
+
+
+class EquivalenceIndex:
+    """
+    Card representations are equivalent across catalogs when they share a proto
+    card. The index keeps every card's (proto card, catalog) and, per proto
+    card, the cards grouped by catalog, so translating a card is two dict
+    lookups.
+
+    Every read first applies the change log entries of card and set
+    representations written since the last read, so writes of other worker
+    processes, imports and datagen are seen as well.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.loaded = False
+        # the last change log entry applied
+        self.seq = 0
+        self.cards: dict[int, tuple[int, int]] = {}
+        self.by_proto_card: dict[int, dict[int, set[int]]] = {}
+
+    @staticmethod
+    def statement():
+        return select(
+            CardRepresentation.id,
+            CardRepresentation.proto_card_id,
+            SetRepresentation.catalog_id,
+        ).join(SetRepresentation)
+
+    def put(self, id: int, proto_card_id: int, catalog_id: int):
+        self.drop(id)
+        self.cards[id] = (proto_card_id, catalog_id)
+        catalogs = self.by_proto_card.setdefault(proto_card_id, defaultdict(set))
+        catalogs[catalog_id].add(id)
+
+    def drop(self, id: int):
+        entry = self.cards.pop(id, None)
+        if entry is None:
+            return
+        proto_card_id, catalog_id = entry
+        catalogs = self.by_proto_card[proto_card_id]
+        catalogs[catalog_id].discard(id)
+        if not catalogs[catalog_id]:
+            del catalogs[catalog_id]
+            if not catalogs:
+                del self.by_proto_card[proto_card_id]
+
+    def load(self, connection: Connection):
+        self.cards.clear()
+        self.by_proto_card.clear()
+        # read before the rows, changes in between are applied once more
+        self.seq = connection.execute(select(func.max(change_log.c.seq))).scalar() or 0
+        for row in connection.execute(self.statement()):
+            self.put(*row)
+        self.loaded = True
+
+    def reload(self, connection: Connection, column, ids: list[int]):
+        for chunk in chunked(ids):
+            statement = self.statement().where(column.in_(chunk))
+            for row in connection.execute(statement):
+                self.put(*row)
+
+    def sync(self):
+        """Apply the changes written since the last call."""
+        with self.lock, get_engine().connect() as connection:
+            if not self.loaded:
+                self.load(connection)
+                return
+            statement = (
+                select(change_log.c.seq, change_log.c.table_name, change_log.c.row_id)
+                .where(change_log.c.table_name.in_(SOURCES))
+                .where(change_log.c.seq > self.seq)
+                .order_by(change_log.c.seq)
+                .limit(MAX_CATCH_UP + 1)
+            )
+            entries = connection.execute(statement).all()
+            if len(entries) > MAX_CATCH_UP:
+                self.load(connection)
+                return
+            if not entries:
+                return
+            cards = [row_id for _, table, row_id in entries if table == SOURCES[0]]
+            sets = [row_id for _, table, row_id in entries if table == SOURCES[1]]
+            # cards that no longer exist or lost their set are dropped, the
+            # others are read again
+            for id in cards:
+                self.drop(id)
+            self.reload(connection, CardRepresentation.id, cards)
+            # a set moving to another catalog moves all of its cards with it
+            self.reload(connection, CardRepresentation.set_representation_id, sets)
+            self.seq = entries[-1].seq
+
+    def equivalents(self, id: int, catalog_id: int | None) -> CardEquivalents | None:
+        with self.lock:
+            entry = self.cards.get(id)
+            if entry is None:
+                return None
+            proto_card_id, own_catalog_id = entry
+            catalogs = self.by_proto_card[proto_card_id]
+            if catalog_id is not None:
+                catalogs = {catalog_id: catalogs.get(catalog_id, ())}
+            equivalents = [
+                Equivalent(card_representation_id=other_id, catalog_id=other_catalog)
+                for other_catalog, other_ids in catalogs.items()
+                for other_id in sorted(other_ids)
+                if other_id != id
+            ]
+        return CardEquivalents(
+            card_representation_id=id,
+            proto_card_id=proto_card_id,
+            catalog_id=own_catalog_id,
+            equivalents=equivalents,
+        )
+
+
+equivalence_index = EquivalenceIndex()
+
+
+def read_equivalents(id: int, catalog_id: int | None = None):
+    equivalence_index.sync()
+    result = equivalence_index.equivalents(id, catalog_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="card_representation not found")
+    return result
+
+
+def read_many_equivalents(request: EquivalentsRequest):
+    equivalence_index.sync()
+    items = []
+    missing = []
+    for id in request.ids:
+        result = equivalence_index.equivalents(id, request.catalog_id)
+        if result is None:
+            missing.append(id)
+        else:
+            items.append(result)
+    return EquivalentsBatch(items=items, missing=missing)
@@ -0,0 +1,81 @@
+import datetime
+import hashlib
+
+from sqlalchemy import Connection, bindparam, event, text
+from sqlmodel import SQLModel
+
+VERSION_TABLE = "table_version"
+
+
+def ddl_statements(tables: list[str]) -> list[str]:
+    statements = [
+        f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} "
+        "(name VARCHAR PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0)"
+    ]
+    for table in tables:
+        bump = (
+            f"UPDATE {VERSION_TABLE} SET version = version + 1 WHERE name = '{table}';"
+        )
+        statements.append(
+            f"INSERT OR IGNORE INTO {VERSION_TABLE}(name, version) VALUES ('{table}', 0)"
+        )
+        for operation in ("INSERT", "UPDATE", "DELETE"):
+            statements.append(
+                f"CREATE TRIGGER IF NOT EXISTS {VERSION_TABLE}_{table}_"
+                f"{operation.lower()} AFTER {operation} ON {table} BEGIN {bump} END"
+            )
+    return statements
+
+
+def install(connection: Connection):
+    tables = [table.name for table in SQLModel.metadata.sorted_tables]
+    for statement in ddl_statements(tables):
+        connection.exec_driver_sql(statement)
+
+
+@event.listens_for(SQLModel.metadata, "after_create")
+def create_version_table(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        install(connection)
+
+
+def table_version(connection: Connection, name: str) -> int:
+    return connection.execute(
+        text(f"SELECT version FROM {VERSION_TABLE} WHERE name = :name"), {"name": name}
+    ).scalar_one()
+
+
+def table_versions(connection: Connection, names: tuple[str, ...]) -> tuple[int, ...]:
+    rows = connection.execute(
+        text(
+            f"SELECT name, version FROM {VERSION_TABLE} WHERE name IN :names"
+        ).bindparams(bindparam("names", expanding=True)),
+        {"names": list(names)},
+    )
+    versions = dict(rows.all())
+    return tuple(versions[name] for name in names)
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def row_etag(
+    id: int, created_at: datetime.datetime, updated_at: datetime.datetime | None
+) -> str:
+    return make_etag(id, (updated_at or created_at).isoformat())
+
+
+def collection_etag(name: str, version: int, *parameters) -> str:
+    return make_etag(name, version, *parameters)
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return etag in candidates
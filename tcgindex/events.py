@@ -0,0 +1,20 @@
+from collections import defaultdict
+from typing import Callable, Literal
+
+Action = Literal["create", "update", "delete"]
+Listener = Callable[[str, Action, list[int]], None]
+
+_listeners: dict[str, list[Listener]] = defaultdict(list)
+
+
+def listen(names: list[str], listener: Listener):
+    """Call listener(name, action, ids) after rows of the given resources are committed."""
+    for name in names:
+        _listeners[name].append(listener)
+
+
+def notify(name: str, action: Action, ids: list[int]):
+    if not ids:
+        return
+    for listener in _listeners[name]:
+        listener(name, action, ids)
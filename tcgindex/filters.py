@@ -0,0 +1,140 @@
+import datetime
+import inspect
+from typing import Annotated, Any
+
+from fastapi import HTTPException, Query, Request
+from sqlalchemy import Table, UniqueConstraint, func, literal
+from sqlmodel import SQLModel
+
+from tcgindex.database import IN_CHUNK_SIZE
+
+EQUALITY_COLUMNS = ("identifier", "locale", "name")
+RANGE_COLUMN = "updated_at"
+# half-open interval on updated_at
+RANGE_PARAMETERS = {"updated_since": "__ge__", "updated_before": "__lt__"}
+# Without a hint sqlite satisfies ORDER BY id LIMIT n by scanning the table in
+# rowid order, even when only a few recently updated rows match. Declaring the
+# range selective makes it seek the updated_at index and sort the matches.
+RANGE_LIKELIHOOD = 0.05
+
+
+def indexed_columns(table: Table) -> set[str]:
+    """Columns that lead an index, so an equality or range filter can seek on them."""
+    indexed = {column.name for column in table.primary_key}
+    indexed.update(index.columns[0].name for index in table.indexes)
+    indexed.update(
+        constraint.columns[0].name
+        for constraint in table.constraints
+        if isinstance(constraint, UniqueConstraint) and constraint.columns
+    )
+    indexed.update(column.name for column in table.columns if column.unique)
+    return indexed
+
+
+class Filters:
+    """
+    Filter parameters of a list endpoint. The primary key, every foreign key and
+    the identifier, locale and name columns can be filtered by equality, a
+    repeated parameter selects any of the given values. updated_at can be
+    limited to a range. Only indexed columns are offered, so every filter
+    compiles to a WHERE clause the database can answer from an index.
+    """
+
+    def __init__(self, db_model: type[SQLModel], dialect: str = "sqlite"):
+        self.table: Table = db_model.__table__
+        self.dialect = dialect
+        indexed = indexed_columns(self.table)
+        self.columns = [
+            column.name
+            for column in self.table.columns
+            if (
+                column.primary_key
+                or column.foreign_keys
+                or column.name in EQUALITY_COLUMNS
+            )
+            and column.name in indexed
+        ]
+        self.ranges = RANGE_PARAMETERS if RANGE_COLUMN in indexed else {}
+
+    def parameters(self) -> list[inspect.Parameter]:
+        parameters = [
+            inspect.Parameter(
+                name,
+                inspect.Parameter.KEYWORD_ONLY,
+                default=None,
+                annotation=Annotated[
+                    list[self.table.c[name].type.python_type] | None,
+                    Query(max_length=IN_CHUNK_SIZE),
+                ],
+            )
+            for name in self.columns
+        ]
+        parameters.extend(
+            inspect.Parameter(
+                name,
+                inspect.Parameter.KEYWORD_ONLY,
+                default=None,
+                annotation=datetime.datetime | None,
+            )
+            for name in self.ranges
+        )
+        return parameters
+
+    def add_to(self, endpoint):
+        """Append the filter parameters to the signature FastAPI reads."""
+        signature = inspect.signature(endpoint)
+        parameters = [
+            parameter
+            for parameter in signature.parameters.values()
+            if parameter.kind is not inspect.Parameter.VAR_KEYWORD
+        ]
+        endpoint.__signature__ = signature.replace(
+            parameters=parameters + self.parameters()
+        )
+        return endpoint
+
+    def clauses(self, values: dict[str, Any]) -> list:
+        clauses = []
+        for name in self.columns:
+            selected = values.get(name)
+            if not selected:
+                continue
+            column = self.table.c[name]
+            if len(selected) == 1:
+                clauses.append(column == selected[0])
+            else:
+                clauses.append(column.in_(selected))
+        for name, operator in self.ranges.items():
+            if values.get(name) is not None:
+                column = self.table.c[RANGE_COLUMN]
+                clause = getattr(column, operator)(values[name])
+                if self.dialect == "sqlite":
+                    clause = func.likelihood(
+                        clause, literal(RANGE_LIKELIHOOD, literal_execute=True)
+                    )
+                clauses.append(clause)
+        return clauses
+
+    def key(self, values: dict[str, Any]) -> tuple:
+        """A hashable form of the filters for cache keys and etags."""
+        return tuple(
+            (name, tuple(value) if isinstance(value, list) else value)
+            for name, value in sorted(values.items())
+            if value
+        )
+
+    def reject_unindexed(self, request: Request):
+        """Dependency that refuses filters on columns without an index."""
+        offered = set(self.columns)
+        for name in request.query_params:
+            if name == RANGE_COLUMN and self.ranges:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"cannot filter on {name} by equality, "
+                    f"use {' and '.join(self.ranges)}",
+                )
+            if name in self.table.c and name not in offered:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"cannot filter on {name}, the column is not indexed",
+                )
@@ -0,0 +1,476 @@
+import functools
+import heapq
+import itertools
+import math
+import re
+import threading
+import unicodedata
+from array import array
+from collections import Counter
+from operator import itemgetter
+from typing import Annotated, Any, Hashable
+
+from fastapi import HTTPException, Query
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlmodel import SQLModel
+
+from tcgindex import events
+from tcgindex.database import chunked, get_engine
+
+LOAD_CHUNK_SIZE = 10000
+# per query word: the words of the vocabulary it is matched with, the words
+# scored to find them and the posting entries counted for them
+WORDS_PER_TERM = 10
+WORD_THRESHOLD = 0.3
+WORD_CANDIDATES = 60
+WORD_POSTINGS_BUDGET = 10000
+# per query: the name posting entries counted and the names scored
+POSTINGS_BUDGET = 30000
+CANDIDATES = 200
+# trigram sets of recently scored words
+WORD_CACHE_SIZE = 1 << 16
+# how long a match waits for an index that is still being built
+LOAD_WAIT = 5.0
+EMPTY = array("i")
+
+
+def normalize(name: str) -> str:
+    """Casefold, strip diacritics and collapse punctuation to single spaces."""
+    decomposed = unicodedata.normalize("NFKD", name.casefold())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(re.findall(r"[^\W_]+", stripped))
+
+
+def trigrams(normalized: str) -> set[str]:
+    grams = set()
+    for word in normalized.split():
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+@functools.lru_cache(maxsize=WORD_CACHE_SIZE)
+def word_trigrams(word: str) -> frozenset[str]:
+    return frozenset(trigrams(word))
+
+
+def most_common(counts: Counter, n: int) -> list:
+    """
+    The n keys with the highest counts, ties in the order they were counted.
+    Counts are small, so the lowest count kept is read from their histogram
+    instead of ordering all keys.
+    """
+    if len(counts) <= n:
+        return list(counts)
+    histogram = Counter(counts.values())
+    kept = 0
+    for lowest in sorted(histogram, reverse=True):
+        kept += histogram[lowest]
+        if kept >= n:
+            break
+    keys = [key for key, count in counts.items() if count > lowest]
+    ties = (key for key, count in counts.items() if count == lowest)
+    keys.extend(itertools.islice(ties, n - len(keys)))
+    return keys
+
+
+class NumberedIndex:
+    """
+    Base of the indexes below. Every distinct normalized name is numbered once,
+    however many entries carry it, and the postings of the terms of the names
+    are arrays of these numbers. Removed names are only marked, a posting is
+    compacted once half of it is stale.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        # per name number, None once no entry carries the name
+        self.names: list[str | None] = []
+        # per name number, the size of its trigram set
+        self.sizes: list[int] = []
+        self.members: list[list[Hashable]] = []
+        self.numbers: dict[str, int] = {}
+        self.entries: dict[Hashable, tuple[str, int, Any]] = {}
+        self.postings: dict[str, array] = {}
+        self.stale: Counter = Counter()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def terms(self, normalized: str) -> set[str]:
+        raise NotImplementedError
+
+    def size(self, normalized: str, terms: set[str]) -> int:
+        return len(trigrams(normalized))
+
+    def term_added(self, term: str):
+        """Called when the first name with term is added."""
+
+    def term_removed(self, term: str):
+        """Called when the last name with term is removed."""
+
+    def add(self, key: Hashable, name: str, payload: Any = None, normalized=None):
+        with self.lock:
+            self.remove(key)
+            if normalized is None:
+                normalized = normalize(name)
+            number = self.numbers.get(normalized)
+            if number is None:
+                terms = self.terms(normalized)
+                if not terms:
+                    return
+                number = len(self.names)
+                for term in terms:
+                    posting = self.postings.get(term)
+                    if posting is None:
+                        posting = self.postings[term] = array("i")
+                        self.term_added(term)
+                    posting.append(number)
+                self.numbers[normalized] = number
+                self.names.append(normalized)
+                self.sizes.append(self.size(normalized, terms))
+                self.members.append([])
+            self.members[number].append(key)
+            self.entries[key] = (name, number, payload)
+
+    def remove(self, key: Hashable):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return
+            number = entry[1]
+            members = self.members[number]
+            members.remove(key)
+            if members:
+                return
+            normalized = self.names[number]
+            del self.numbers[normalized]
+            self.names[number] = None
+            for term in self.terms(normalized):
+                self.stale[term] += 1
+                posting = self.postings[term]
+                if self.stale[term] * 2 < len(posting):
+                    continue
+                del self.stale[term]
+                posting = array("i", (n for n in posting if self.names[n] is not None))
+                if posting:
+                    self.postings[term] = posting
+                    continue
+                del self.postings[term]
+                self.term_removed(term)
+
+
+class TrigramIndex(NumberedIndex):
+    """
+    In-memory trigram index scoring candidates with the Jaccard similarity of
+    their trigram sets, like pg_trgm. It holds the vocabulary of a NameIndex,
+    so the names here are single words, and its postings are per trigram.
+
+    A search counts the postings of the rarest query trigrams: an entry
+    reaching the similarity threshold shares at least k = ceil(threshold *
+    |query|) trigrams with the query, so it appears in one of the |query| - k
+    + 1 rarest postings. Reading stops once budget entries were counted, which
+    bounds the work for queries made of common trigrams only, at the cost of
+    missing names that share none of the rarest trigrams read. The candidates
+    names sharing the most trigrams are then scored exactly.
+    """
+
+    def terms(self, normalized: str) -> set[str]:
+        return trigrams(normalized)
+
+    def size(self, normalized: str, terms: set[str]) -> int:
+        return len(terms)
+
+    def search(
+        self, query: str, threshold: float, candidates: int, budget: int
+    ) -> list[tuple[float, str, Any]]:
+        grams = trigrams(normalize(query))
+        if not grams:
+            return []
+        min_overlap = max(1, math.ceil(threshold * len(grams)))
+        # the jaccard similarity can only reach the threshold for names whose
+        # own trigram count lies within these bounds
+        min_size, max_size = threshold * len(grams), len(grams) / threshold
+        with self.lock:
+            postings = sorted(
+                (self.postings.get(gram, EMPTY) for gram in grams), key=len
+            )
+            counts = Counter()
+            read = 0
+            for posting in postings[: len(grams) - min_overlap + 1]:
+                if read + len(posting) > budget:
+                    if read:
+                        break
+                    posting = posting[:budget]
+                counts.update(posting)
+                read += len(posting)
+            results = []
+            for number in most_common(counts, candidates):
+                name = self.names[number]
+                size = self.sizes[number]
+                if name is None or not min_size <= size <= max_size:
+                    continue
+                common = len(grams & word_trigrams(name))
+                score = common / (len(grams) + size - common)
+                if score < threshold:
+                    continue
+                for key in self.members[number]:
+                    original, _, payload = self.entries[key]
+                    results.append((score, original, payload))
+        return results
+
+
+class NameIndex(NumberedIndex):
+    """
+    Index of names scored with the Jaccard similarity of the trigram sets of
+    the whole names, like pg_trgm. Its postings are per word.
+
+    Candidates are found through words, which are far more selective than
+    trigrams in catalogs of millions of names: every query word is looked up in
+    a TrigramIndex of the distinct words, and the names containing the
+    WORDS_PER_TERM closest words are counted from their postings, the query
+    words with the shortest postings first, up to POSTINGS_BUDGET entries. The
+    CANDIDATES names containing most query words are then scored exactly, the
+    trigrams a name shares with the query are those shared by its words.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.words = TrigramIndex()
+
+    def terms(self, normalized: str) -> set[str]:
+        return set(normalized.split())
+
+    def term_added(self, term: str):
+        self.words.add(term, term, normalized=term)
+
+    def term_removed(self, term: str):
+        self.words.remove(term)
+
+    def search(
+        self, query: str, threshold: float, limit: int
+    ) -> list[tuple[float, str, Any]]:
+        """The best limit payloads, each with its most similar name."""
+        normalized = normalize(query)
+        grams = trigrams(normalized)
+        if not grams:
+            return []
+        # the jaccard similarity can only reach the threshold for names whose
+        # own trigram count lies within these bounds
+        min_size, max_size = threshold * len(grams), len(grams) / threshold
+        with self.lock:
+            terms = []
+            for word in dict.fromkeys(normalized.split()):
+                similar = heapq.nlargest(
+                    WORDS_PER_TERM,
+                    self.words.search(
+                        word, WORD_THRESHOLD, WORD_CANDIDATES, WORD_POSTINGS_BUDGET
+                    ),
+                    key=itemgetter(0),
+                )
+                # the closest words first
+                terms.append([self.postings[word] for _, word, _ in similar])
+            terms.sort(key=lambda postings: sum(map(len, postings)))
+            counts = Counter()
+            read = 0
+            for postings in terms:
+                for posting in postings:
+                    if read + len(posting) > POSTINGS_BUDGET:
+                        if read:
+                            continue
+                        posting = posting[:POSTINGS_BUDGET]
+                    counts.update(posting)
+                    read += len(posting)
+            scored = []
+            # the query trigrams in each word of the candidates, the trigrams a
+            # name shares with the query are the union of those of its words
+            shared: dict[str, set[str]] = {}
+            # ties keep the counting order, rare and close words first
+            for number in most_common(counts, CANDIDATES):
+                name = self.names[number]
+                size = self.sizes[number]
+                if name is None or not min_size <= size <= max_size:
+                    continue
+                in_words = []
+                for word in name.split():
+                    if word not in shared:
+                        shared[word] = grams & word_trigrams(word)
+                    in_words.append(shared[word])
+                common = len(set().union(*in_words))
+                score = common / (len(grams) + size - common)
+                if score >= threshold:
+                    scored.append((score, number))
+            scored.sort(key=itemgetter(0), reverse=True)
+            # a name can be carried by thousands of rows, they are only read
+            # until enough payloads were found
+            results = []
+            seen = set()
+            for score, number in scored:
+                for key in self.members[number]:
+                    original, _, payload = self.entries[key]
+                    if payload in seen:
+                        continue
+                    seen.add(payload)
+                    results.append((score, original, payload))
+                    if len(results) == limit:
+                        return results
+        return results
+
+
+class NameMatch(BaseModel):
+    kind: str
+    id: int
+    name: str
+    score: float
+
+
+class NameMatcher:
+    """
+    Fuzzy matcher over the names of several tables. sources maps every indexed
+    table to the kind of result it stands for and, for localized names, the
+    column pointing at the owning row.
+
+    The index is built once in a background thread, started with the app.
+    Writes committed meanwhile are queued and applied when the build is done,
+    so they never wait for it.
+    """
+
+    def __init__(self, sources: dict[str, tuple[str, str | None]]):
+        self.sources = sources
+        self.index = NameIndex()
+        self.ready = threading.Event()
+        # guards started and pending
+        self.lock = threading.Lock()
+        self.started = False
+        # changes notified during the build, None when not building
+        self.pending: list[tuple[str, events.Action, list[int]]] | None = None
+        # applies changes one at a time, so rows are read and indexed in order
+        self.apply_lock = threading.Lock()
+        events.listen(list(sources), self.on_change)
+
+    def columns(self, source: str):
+        table = SQLModel.metadata.tables[source]
+        owner_column = self.sources[source][1]
+        owner = table.c[owner_column] if owner_column else table.c.id
+        return table, [table.c.id, owner, table.c.name]
+
+    def add_rows(self, index: NameIndex, source: str, rows, normalized=None):
+        kind = self.sources[source][0]
+        for id, owner_id, name in rows:
+            if normalized is None:
+                index.add((source, id), name, (kind, owner_id))
+                continue
+            # the same names recur across catalogs and locales
+            if name not in normalized:
+                normalized[name] = normalize(name)
+            index.add((source, id), name, (kind, owner_id), normalized[name])
+
+    def start(self):
+        """Start building the index in the background, unless it was started."""
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+            self.pending = []
+        threading.Thread(target=self.build, name="name-index", daemon=True).start()
+
+    def build(self):
+        try:
+            index = NameIndex()
+            normalized = {}
+            with get_engine().connect() as connection:
+                for source in self.sources:
+                    table, columns = self.columns(source)
+                    result = connection.execution_options(
+                        yield_per=LOAD_CHUNK_SIZE
+                    ).execute(select(*columns))
+                    self.add_rows(index, source, result, normalized)
+            while True:
+                with self.lock:
+                    changes, self.pending = self.pending, []
+                    if not changes:
+                        self.index = index
+                        self.pending = None
+                        self.ready.set()
+                        break
+                for change in changes:
+                    self.apply(index, *change)
+        except BaseException:
+            # the next match starts over
+            with self.lock:
+                self.started = False
+                self.pending = None
+            raise
+
+    def apply(self, index: NameIndex, source: str, action, ids: list[int]):
+        with self.apply_lock:
+            rows = []
+            if action != "delete":
+                table, columns = self.columns(source)
+                with get_engine().connect() as connection:
+                    for chunk in chunked(ids):
+                        statement = select(*columns).where(table.c.id.in_(chunk))
+                        rows.extend(connection.execute(statement))
+            found = {row[0] for row in rows}
+            with index.lock:
+                # also drops rows deleted since the change was notified
+                for id in ids:
+                    if id not in found:
+                        index.remove((source, id))
+                self.add_rows(index, source, rows)
+
+    def on_change(self, source: str, action: events.Action, ids: list[int]):
+        with self.lock:
+            if self.pending is not None:
+                self.pending.append((source, action, ids))
+                return
+            ready = self.ready.is_set()
+        # before the build started, it will read the rows itself
+        if ready:
+            self.apply(self.index, source, action, ids)
+
+    def match(self, query: str, limit: int, threshold: float) -> list[NameMatch]:
+        self.start()
+        if not self.ready.wait(LOAD_WAIT):
+            raise HTTPException(
+                status_code=503,
+                detail="the name index is being built",
+                headers={"Retry-After": str(int(LOAD_WAIT))},
+            )
+        return [
+            NameMatch(kind=kind, id=id, name=name, score=score)
+            for score, name, (kind, id) in self.index.search(query, threshold, limit)
+        ]
+
+
+card_matcher = NameMatcher(
+    {
+        "proto_card": ("proto_card", None),
+        "card_representation": ("card_representation", None),
+        "localized_card_name": ("card_representation", "card_representation_id"),
+    }
+)
+set_matcher = NameMatcher(
+    {
+        "proto_set": ("proto_set", None),
+        "set_representation": ("set_representation", None),
+        "localized_set_name": ("set_representation", "set_representation_id"),
+    }
+)
+
+
+def match_cards(
+    q: Annotated[str, Query(min_length=1)],
+    limit: Annotated[int, Query(ge=1, le=100)] = 10,
+    min_score: Annotated[float, Query(gt=0, le=1)] = 0.3,
+):
+    return card_matcher.match(q, limit, min_score)
+
+
+def match_sets(
+    q: Annotated[str, Query(min_length=1)],
+    limit: Annotated[int, Query(ge=1, le=100)] = 10,
+    min_score: Annotated[float, Query(gt=0, le=1)] = 0.3,
+):
+    return set_matcher.match(q, limit, min_score)
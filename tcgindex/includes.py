@@ -0,0 +1,104 @@
+"""
+Support for the include query parameter, which embeds related rows in a
+response, e.g. GET /set_representation/1?include=localized_names,
+card_representations.localized_names.
+
+Every relationship on a path is loaded with selectinload, one query per
+relationship for all rows of the response, so the number of queries depends on
+the include and not on the number of rows. The response models with the
+embedded rows are generated from the public models and cached.
+"""
+
+import dataclasses
+import functools
+
+from pydantic import create_model
+from sqlalchemy import inspect
+from sqlalchemy.orm import selectinload
+from sqlmodel import SQLModel
+
+from tcgindex.models import PublicModel
+
+MAX_DEPTH = 3
+
+public_models: dict[type[SQLModel], type[PublicModel]] = {}
+
+
+@dataclasses.dataclass(frozen=True)
+class Include:
+    # the normalized include parameter
+    key: str
+    options: tuple
+    model: type[PublicModel]
+    # every table the response is read from
+    tables: tuple[str, ...]
+
+
+def register(db_model: type[SQLModel], public_model: type[PublicModel]):
+    public_models[db_model] = public_model
+
+
+def parse(include: str | None) -> tuple[str, ...]:
+    if include is None:
+        return ()
+    return tuple(sorted({path.strip() for path in include.split(",") if path.strip()}))
+
+
+def resolve(db_model: type[SQLModel], include: str | None) -> Include | None:
+    """Return the loader options and response model, None without an include."""
+    paths = parse(include)
+    return build(db_model, paths) if paths else None
+
+
+def freeze(tree: dict) -> tuple:
+    return tuple(sorted((name, freeze(subtree)) for name, subtree in tree.items()))
+
+
+@functools.lru_cache(maxsize=1024)
+def build(db_model: type[SQLModel], paths: tuple[str, ...]) -> Include:
+    tree = {}
+    options = []
+    tables = {db_model.__tablename__}
+    for path in paths:
+        names = path.split(".")
+        if len(names) > MAX_DEPTH:
+            raise ValueError(f"{path} is nested deeper than {MAX_DEPTH} levels")
+        model = db_model
+        node = tree
+        loader = None
+        for name in names:
+            relationship = inspect(model).relationships.get(name)
+            if relationship is None:
+                raise ValueError(f"{model.__tablename__} has no relationship {name}")
+            attribute = getattr(model, name)
+            if loader is None:
+                loader = selectinload(attribute)
+            else:
+                loader = loader.selectinload(attribute)
+            model = relationship.mapper.class_
+            tables.add(model.__tablename__)
+            node = node.setdefault(name, {})
+        options.append(loader)
+    return Include(
+        key=",".join(paths),
+        options=tuple(options),
+        model=nested_model(db_model, freeze(tree)),
+        tables=tuple(sorted(tables)),
+    )
+
+
+@functools.cache
+def nested_model(db_model: type[SQLModel], tree: tuple) -> type[PublicModel]:
+    public_model = public_models[db_model]
+    if not tree:
+        return public_model
+    fields = {}
+    for name, subtree in tree:
+        relationship = inspect(db_model).relationships[name]
+        model = nested_model(relationship.mapper.class_, subtree)
+        fields[name] = (list[model] if relationship.uselist else model, ...)
+    # e.g. SetRepresentationPublicWithLocalizedNames
+    suffix = "".join(name.title().replace("_", "") for name, _ in tree)
+    return create_model(
+        f"{public_model.__name__}With{suffix}", __base__=public_model, **fields
+    )
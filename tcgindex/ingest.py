@@ -0,0 +1,521 @@
+"""
+Streaming import of catalog dumps.
+
+A dump is a sequence of set and card records in NDJSON, a JSON array or CSV:
+
+    {"type": "set", "game": "Magic", "catalog": "Scryfall", "identifier": "LEA",
+     "name": "Alpha", "size": 295, "localized_names": {"de": "Alpha"}}
+    {"type": "card", "game": "Magic", "catalog": "Scryfall", "set": "LEA",
+     "identifier": "161", "name": "Lightning Bolt"}
+
+CSV dumps use the record keys as columns and one name:<locale> column per
+locale. Games, catalogs, proto sets and proto cards are looked up by name and
+created when missing. Set and card representations are upserted by their
+identifier within the catalog and set, localized names by locale.
+
+Records are read lazily and written in batches, one transaction per batch, so
+memory stays bounded by the batch size. After every batch the number of
+records consumed is written to a checkpoint file, an interrupted import started
+again with the same checkpoint skips what was already committed.
+"""
+
+import csv
+import json
+import os
+import tempfile
+from collections import defaultdict
+from pathlib import Path
+from typing import Annotated, Any, Callable, Iterable, Iterator, Literal, TextIO
+
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+from sqlalchemy import Engine, select
+from sqlalchemy.dialects import sqlite
+from sqlmodel import Session, SQLModel, insert
+
+from tcgindex import events
+from tcgindex.database import chunked, get_engine
+from tcgindex.models import (
+    BulkCreateError,
+    CardRepresentation,
+    Catalog,
+    Game,
+    LocalizedCardName,
+    LocalizedSetName,
+    ProtoCard,
+    ProtoSet,
+    SetRepresentation,
+    utc_now,
+)
+
+Format = Literal["ndjson", "json", "csv"]
+
+DEFAULT_BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 100
+LOCALE_COLUMN_PREFIX = "name:"
+READ_SIZE = 1 << 16
+UPSERT_INSERTS = {"sqlite": sqlite.insert}
+
+
+class SetRecord(BaseModel):
+    type: Literal["set"]
+    game: str
+    catalog: str
+    # defaults to the set's own name
+    proto_set: str | None = None
+    identifier: str
+    name: str
+    size: int
+    localized_names: dict[str, str] = {}
+
+
+class CardRecord(BaseModel):
+    type: Literal["card"]
+    game: str
+    catalog: str
+    # identifier of the set representation within the catalog
+    set: str
+    identifier: str
+    # defaults to the card's own name
+    proto_card: str | None = None
+    name: str
+    localized_names: dict[str, str] = {}
+
+
+Record = Annotated[SetRecord | CardRecord, Field(discriminator="type")]
+record_adapter = TypeAdapter(Record)
+
+
+class ImportResult(BaseModel):
+    resumed_from: int = 0
+    records: int = 0
+    set_representations: int = 0
+    card_representations: int = 0
+    localized_names: int = 0
+    skipped: int = 0
+    errors: list[BulkCreateError] = []
+
+
+class InvalidRecord(ValueError):
+    def __init__(self, error: BulkCreateError):
+        super().__init__(f"record {error.index} is invalid: {error.errors}")
+        self.error = error
+
+
+def ndjson_records(file: TextIO) -> Iterator[Any]:
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def json_records(file: TextIO) -> Iterator[Any]:
+    """Yield the elements of a top-level JSON array without loading all of it."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+
+    def fill(buffer):
+        while not buffer.strip():
+            chunk = file.read(READ_SIZE)
+            if not chunk:
+                raise ValueError("unexpected end of JSON array")
+            buffer += chunk
+        return buffer.lstrip()
+
+    buffer = fill(buffer)
+    if buffer[0] != "[":
+        raise ValueError("expected a JSON array of records")
+    buffer = buffer[1:]
+    while True:
+        buffer = fill(buffer)
+        if buffer[0] == "]":
+            return
+        if buffer[0] == ",":
+            buffer = buffer[1:]
+            continue
+        try:
+            element, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            # the element continues past the end of the buffer
+            chunk = file.read(READ_SIZE)
+            if not chunk:
+                raise
+            buffer += chunk
+            continue
+        yield element
+        buffer = buffer[end:]
+
+
+def csv_records(file: TextIO) -> Iterator[dict[str, Any]]:
+    for row in csv.DictReader(file):
+        record = {"localized_names": {}}
+        for column, value in row.items():
+            if column is None or value in (None, ""):
+                continue
+            if column.startswith(LOCALE_COLUMN_PREFIX):
+                locale = column.removeprefix(LOCALE_COLUMN_PREFIX)
+                record["localized_names"][locale] = value
+            else:
+                record[column] = value
+        yield record
+
+
+READERS: dict[str, Callable[[TextIO], Iterator[Any]]] = {
+    "ndjson": ndjson_records,
+    "json": json_records,
+    "csv": csv_records,
+}
+
+
+def guess_format(path: Path) -> Format:
+    suffix = path.suffix.lower().lstrip(".")
+    if suffix in ("csv", "json"):
+        return suffix
+    return "ndjson"
+
+
+def get_or_create(
+    session: Session,
+    model: type[SQLModel],
+    names: set[str],
+    created: list[int],
+    **scope,
+) -> dict[str, int]:
+    """Map names to ids within the scope, inserting the names that do not exist."""
+    ids = {}
+    filters = [getattr(model, column) == value for column, value in scope.items()]
+    for chunk in chunked(sorted(names)):
+        statement = (
+            select(model.id, model.name)
+            .where(model.name.in_(chunk), *filters)
+            .order_by(model.id)
+        )
+        for id, name in session.execute(statement):
+            # names are not unique, the oldest row wins
+            ids.setdefault(name, id)
+    missing = [name for name in names if name not in ids]
+    if missing:
+        statement = insert(model).returning(model.id, model.name)
+        rows = [{"name": name, **scope} for name in missing]
+        for id, name in session.execute(statement, rows):
+            ids[name] = id
+            created.append(id)
+    return ids
+
+
+def upsert(
+    session: Session,
+    model: type[SQLModel],
+    rows: list[dict[str, Any]],
+    keys: tuple[str, str],
+) -> dict[tuple, int]:
+    """Insert rows or update the row with the same keys, return the ids by key."""
+    if not rows:
+        return {}
+    dialect = session.get_bind().dialect.name
+    if dialect not in UPSERT_INSERTS:
+        raise NotImplementedError(f"upserts are not supported on {dialect}")
+    statement = UPSERT_INSERTS[dialect](model)
+    values = {
+        column: statement.excluded[column] for column in rows[0] if column not in keys
+    }
+    statement = statement.on_conflict_do_update(
+        index_elements=keys, set_={**values, "updated_at": utc_now()}
+    ).returning(model.id, *(getattr(model, key) for key in keys))
+    # RETURNING carries the keys, so ids are matched up without relying on
+    # the order of the returned rows
+    return {tuple(row[1:]): row[0] for row in session.execute(statement, rows)}
+
+
+class Importer:
+    def __init__(
+        self,
+        engine: Engine | None = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        skip_invalid: bool = False,
+        progress: Callable[[ImportResult], None] | None = None,
+    ):
+        self.engine = engine or get_engine()
+        self.batch_size = batch_size
+        self.skip_invalid = skip_invalid
+        self.progress = progress
+        self.result = ImportResult()
+        # games, catalogs, proto sets and set representations are few enough
+        # to be kept for the whole import, proto cards are resolved per batch
+        self.games: dict[str, int] = {}
+        self.catalogs: dict[str, int] = {}
+        self.proto_sets: dict[tuple[int, str], int] = {}
+        self.sets: dict[tuple[int, str], int] = {}
+
+    def reject(self, number: int, errors: list[dict[str, Any]]):
+        error = BulkCreateError(index=number, errors=errors)
+        if not self.skip_invalid:
+            raise InvalidRecord(error)
+        self.result.skipped += 1
+        if len(self.result.errors) < MAX_REPORTED_ERRORS:
+            self.result.errors.append(error)
+
+    def run(
+        self,
+        records: Iterable[Any],
+        skip: int = 0,
+        checkpoint: Callable[[int], None] | None = None,
+    ) -> ImportResult:
+        self.result.resumed_from = skip
+        number = skip
+        batch = []
+        pending = 0
+        for number, data in enumerate(records, start=1):
+            if number <= skip:
+                continue
+            pending += 1
+            try:
+                batch.append((number, record_adapter.validate_python(data)))
+            except ValidationError as exc:
+                self.reject(
+                    number, exc.errors(include_url=False, include_context=False)
+                )
+            if pending >= self.batch_size:
+                self.flush(batch, number, checkpoint)
+                batch = []
+                pending = 0
+        if pending:
+            self.flush(batch, number, checkpoint)
+        return self.result
+
+    def flush(self, batch, number, checkpoint):
+        created, updated = self.write(batch)
+        self.result.records = number - self.result.resumed_from
+        if checkpoint is not None:
+            checkpoint(number)
+        for name, ids in created.items():
+            events.notify(name, "create", ids)
+        # an upsert does not tell inserted from updated rows, listeners
+        # reload the rows by id either way
+        for name, ids in updated.items():
+            events.notify(name, "update", ids)
+        if self.progress is not None:
+            self.progress(self.result)
+
+    def write(self, batch: list[tuple[int, SetRecord | CardRecord]]):
+        sets = [(number, r) for number, r in batch if isinstance(r, SetRecord)]
+        cards = [(number, r) for number, r in batch if isinstance(r, CardRecord)]
+        created = defaultdict(list)
+        updated = defaultdict(list)
+        with Session(self.engine) as session:
+            for model, known, names in (
+                (Game, self.games, {r.game for _, r in batch}),
+                (Catalog, self.catalogs, {r.catalog for _, r in batch}),
+            ):
+                missing = names - known.keys()
+                if missing:
+                    created_ids = created[model.__tablename__]
+                    known.update(get_or_create(session, model, missing, created_ids))
+            self.write_sets(session, sets, created, updated)
+            self.write_cards(session, cards, created, updated)
+            session.commit()
+        return created, updated
+
+    def write_sets(self, session, sets, created, updated):
+        by_game = defaultdict(set)
+        for _, record in sets:
+            by_game[self.games[record.game]].add(record.proto_set or record.name)
+        for game_id, names in by_game.items():
+            missing = {name for name in names if (game_id, name) not in self.proto_sets}
+            if missing:
+                ids = get_or_create(
+                    session, ProtoSet, missing, created["proto_set"], game_id=game_id
+                )
+                for name, id in ids.items():
+                    self.proto_sets[game_id, name] = id
+
+        rows = {}
+        for _, record in sets:
+            game_id = self.games[record.game]
+            catalog_id = self.catalogs[record.catalog]
+            # the last record for a key wins, like it would across batches
+            rows[catalog_id, record.identifier] = (
+                {
+                    "proto_set_id": self.proto_sets[
+                        game_id, record.proto_set or record.name
+                    ],
+                    "catalog_id": catalog_id,
+                    "name": record.name,
+                    "identifier": record.identifier,
+                    "size": record.size,
+                },
+                record.localized_names,
+            )
+        ids = upsert(
+            session,
+            SetRepresentation,
+            [row for row, _ in rows.values()],
+            ("catalog_id", "identifier"),
+        )
+        self.sets.update(ids)
+        self.result.set_representations += len(ids)
+        updated["set_representation"].extend(ids.values())
+        self.write_names(
+            session,
+            LocalizedSetName,
+            "set_representation_id",
+            {ids[key]: names for key, (_, names) in rows.items()},
+            updated,
+        )
+
+    def lookup_sets(self, session, keys: set[tuple[int, str]]):
+        by_catalog = defaultdict(list)
+        for catalog_id, identifier in keys - self.sets.keys():
+            by_catalog[catalog_id].append(identifier)
+        for catalog_id, identifiers in by_catalog.items():
+            for chunk in chunked(identifiers):
+                statement = select(
+                    SetRepresentation.id, SetRepresentation.identifier
+                ).where(
+                    SetRepresentation.catalog_id == catalog_id,
+                    SetRepresentation.identifier.in_(chunk),
+                )
+                for id, identifier in session.execute(statement):
+                    self.sets[catalog_id, identifier] = id
+
+    def write_cards(self, session, cards, created, updated):
+        self.lookup_sets(session, {(self.catalogs[r.catalog], r.set) for _, r in cards})
+        resolved = []
+        for number, record in cards:
+            if (self.catalogs[record.catalog], record.set) in self.sets:
+                resolved.append(record)
+                continue
+            self.reject(
+                number,
+                [
+                    {
+                        "type": "set_not_found",
+                        "loc": ["set"],
+                        "msg": f"set {record.set} not found in catalog "
+                        f"{record.catalog}",
+                        "input": record.set,
+                    }
+                ],
+            )
+
+        by_game = defaultdict(set)
+        for record in resolved:
+            by_game[self.games[record.game]].add(record.proto_card or record.name)
+        proto_cards = {}
+        for game_id, names in by_game.items():
+            ids = get_or_create(
+                session, ProtoCard, names, created["proto_card"], game_id=game_id
+            )
+            for name, id in ids.items():
+                proto_cards[game_id, name] = id
+
+        rows = {}
+        for record in resolved:
+            game_id = self.games[record.game]
+            set_id = self.sets[self.catalogs[record.catalog], record.set]
+            rows[set_id, record.identifier] = (
+                {
+                    "game_id": game_id,
+                    "proto_card_id": proto_cards[
+                        game_id, record.proto_card or record.name
+                    ],
+                    "set_representation_id": set_id,
+                    "name": record.name,
+                    "identifier": record.identifier,
+                },
+                record.localized_names,
+            )
+        ids = upsert(
+            session,
+            CardRepresentation,
+            [row for row, _ in rows.values()],
+            ("set_representation_id", "identifier"),
+        )
+        self.result.card_representations += len(ids)
+        updated["card_representation"].extend(ids.values())
+        self.write_names(
+            session,
+            LocalizedCardName,
+            "card_representation_id",
+            {ids[key]: names for key, (_, names) in rows.items()},
+            updated,
+        )
+
+    def write_names(self, session, model, parent_column, names_by_parent, updated):
+        rows = [
+            {parent_column: parent_id, "locale": locale, "name": name}
+            for parent_id, names in names_by_parent.items()
+            for locale, name in names.items()
+        ]
+        ids = upsert(session, model, rows, (parent_column, "locale"))
+        self.result.localized_names += len(ids)
+        updated[model.__tablename__].extend(ids.values())
+
+
+def read_checkpoint(checkpoint: Path, source: Path) -> int:
+    try:
+        state = json.loads(checkpoint.read_text())
+    except FileNotFoundError:
+        return 0
+    if state["size"] != source.stat().st_size:
+        raise ValueError(
+            f"{checkpoint} was written for a different version of {source}"
+        )
+    return state["records"]
+
+
+def write_checkpoint(checkpoint: Path, source: Path, records: int):
+    # written to a temporary file and renamed, so a crash never leaves a
+    # truncated checkpoint behind
+    temporary = checkpoint.with_name(checkpoint.name + ".tmp")
+    temporary.write_text(
+        json.dumps({"size": source.stat().st_size, "records": records})
+    )
+    os.replace(temporary, checkpoint)
+
+
+def import_file(
+    path: str | Path,
+    format: Format | None = None,
+    checkpoint: str | Path | None = None,
+    **options,
+) -> ImportResult:
+    """
+    Import a dump file. With a checkpoint, records committed by an earlier run
+    with the same checkpoint are skipped and the checkpoint is removed once the
+    import is complete.
+    """
+    path = Path(path)
+    format = format or guess_format(path)
+    importer = Importer(**options)
+    skip = 0
+    save = None
+    if checkpoint is not None:
+        checkpoint = Path(checkpoint)
+        skip = read_checkpoint(checkpoint, path)
+        save = lambda records: write_checkpoint(checkpoint, path, records)
+    with path.open(newline="" if format == "csv" else None, encoding="utf-8") as file:
+        result = importer.run(READERS[format](file), skip=skip, checkpoint=save)
+    if checkpoint is not None:
+        checkpoint.unlink(missing_ok=True)
+    return result
+
+
+async def import_dump(
+    request: Request, format: Format = "ndjson", skip_invalid: bool = False
+):
+    # the body is spooled to disk as it arrives and parsed from there, so
+    # neither the upload nor the records are ever held in memory at once
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / f"dump.{format}"
+        with path.open("wb") as file:
+            async for chunk in request.stream():
+                file.write(chunk)
+        try:
+            return await run_in_threadpool(
+                import_file, path, format, skip_invalid=skip_invalid
+            )
+        except InvalidRecord as exc:
+            raise HTTPException(status_code=422, detail=[exc.error.model_dump()])
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
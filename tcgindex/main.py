@@ -1,11 +1,64 @@
+import argparse
+import contextlib
+import sys
 from pathlib import Path
-from typing import List
-
-from fastapi import FastAPI, HTTPException
-from sqlmodel import Session, SQLModel, create_engine, select
-
+from typing import Annotated, Any, List, Literal
+
+from fastapi import Body, Depends, FastAPI, Header, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import delete as delete_statement
+from sqlalchemy import update as update_statement
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import Session, SQLModel, insert, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from tcgindex import (
+    changes,
+    equivalents,
+    events,
+    fuzzy,
+    includes,
+    ingest,
+    metrics,
+    resolver,
+    search,
+    snapshots,
+)
+from tcgindex.cache import CachedResponse, ResponseCache
+from tcgindex.cascade import CASCADE_RESOURCES, Cascade
+from tcgindex.counts import TOTAL_COUNT_HEADER, total_count
+from tcgindex.filters import Filters
+from tcgindex.serialization import row_encoder
+from tcgindex.etags import (
+    collection_etag,
+    etag_matches,
+    make_etag,
+    row_etag,
+    table_version,
+    table_versions,
+)
+from tcgindex.database import (
+    chunked,
+    create_missing_indexes,
+    get_async_engine,
+    get_engine,
+    get_settings,
+    sqlite_file,
+)
 from tcgindex.models import (
     PublicModel,
+    utc_now,
+    Page,
+    BatchGetResult,
+    BulkCreateError,
+    BulkCreateResult,
+    BulkDeleteResult,
+    BulkUpdateResult,
+    CascadeDeleteResult,
+    ChangePage,
     Catalog,
     CatalogPublic,
     CatalogCreate,
@@ -40,22 +93,84 @@ from tcgindex.models import (
     LocalizedCardNameUpdate,
 )
 
+# bound once, the routes below are built for these engines and settings, see
+# configure_engine
+engine = get_engine()
+async_engine = get_async_engine() if get_settings().async_mode else None
 
-sqlite_file_name = "database.db"
-sqlite_url = f"sqlite:///{sqlite_file_name}"
-engine = create_engine(sqlite_url, echo=True)
-
-
-def get_engine():
-    return engine
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+MAX_BULK_SIZE = 10000
+MAX_BATCH_GET_SIZE = 1000
+EXPORT_CHUNK_SIZE = 1000
+# reference data read far more often than it is written
+CACHED_RESOURCES = {"game", "catalog", "proto_set", "set_representation"}
+CACHE_SIZE = 4096
+CACHE_TTL = 60.0
 
 
 def create_db_and_tables():
-    Path(sqlite_file_name).unlink(missing_ok=True)
+    database_file = sqlite_file(engine.url)
+    if database_file:
+        engine.dispose()
+        for suffix in ("", "-wal", "-shm"):
+            Path(database_file + suffix).unlink(missing_ok=True)
     SQLModel.metadata.create_all(engine)
 
 
-app = FastAPI()
+def upgrade_db():
+    # create_all only creates missing tables, so the indexes of tables that
+    # already exist are added separately
+    SQLModel.metadata.create_all(engine)
+    create_missing_indexes(engine, SQLModel.metadata)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    # the name indexes are built in the background, a request waits for them
+    # only when it arrives before they are ready
+    fuzzy.card_matcher.start()
+    fuzzy.set_matcher.start()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+caches: dict[str, ResponseCache] = {}
+if get_settings().metrics:
+    # set before any route is added, every route is created with this class
+    app.router.route_class = metrics.InstrumentedRoute
+    metrics.instrument(engine)
+    if async_engine is not None:
+        metrics.instrument(async_engine.sync_engine)
+
+
+def read_changes(
+    name: str | None,
+    page_model: type[ChangePage],
+    since: int,
+    limit: int,
+    format: Literal["json", "ndjson"],
+):
+    if format == "ndjson":
+
+        def ndjson():
+            # every change after since, read in chunks like an export
+            for chunk in changes.stream_changes(engine, name, since, EXPORT_CHUNK_SIZE):
+                yield "".join(
+                    change.model_dump_json(serialize_as_any=True) + "\n"
+                    for change in chunk
+                )
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+    with engine.connect() as connection:
+        items, has_more = changes.read_changes(connection, name, since, limit)
+    page = page_model(
+        items=items, cursor=items[-1].seq if items else since, has_more=has_more
+    )
+    return Response(
+        content=page.model_dump_json(serialize_as_any=True),
+        media_type="application/json",
+    )
 
 
 def crud_factory(
@@ -64,31 +179,518 @@ def crud_factory(
     public_model: type[PublicModel],
     create_model: type[SQLModel],
     update_model: type[SQLModel],
+    cache: ResponseCache | None = None,
+    async_engine: AsyncEngine | None = None,
+    fast_serialization: bool = False,
 ):
     endpoint = f"/{name}"
     endpoint_with_id = endpoint + "/{id}"
+    table_name = db_model.__tablename__
+    page_model = Page[public_model]
+    row_names = tuple(public_model.model_fields)
+    list_filters = Filters(db_model, engine.dialect.name)
+    cascade = Cascade(db_model.__table__) if name in CASCADE_RESOURCES else None
+    includes.register(db_model, public_model)
+    changes.register(db_model, public_model)
+
+    def not_found():
+        return HTTPException(status_code=404, detail=f"{name} not found")
+
+    def conflict(exc: IntegrityError):
+        # a unique constraint or a foreign key the write violates
+        return HTTPException(status_code=409, detail=str(exc.orig))
 
     def get(session, id):
         db_instance = session.get(db_model, id)
         if not db_instance:
-            raise HTTPException(status_code=404, detail=f"{name} not found")
+            raise not_found()
+        return db_instance
+
+    def not_modified(etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    def cached(cache_key, if_none_match):
+        """Return a cached response if there is one, else the cache generation."""
+        if cache is None:
+            return None, None
+        hit = cache.get(cache_key)
+        if hit is not None:
+            return hit.to_response(if_none_match), None
+        return None, cache.generation
+
+    def cached_response(key, model_instance, etag, generation):
+        cached = CachedResponse(model_instance.model_dump_json().encode(), etag)
+        cache.set(key, cached, generation)
+        return cached.to_response()
+
+    def encoded_response(body, etag, if_none_match, cache_key, generation):
+        encoded = CachedResponse(body, etag)
+        if cache is not None:
+            cache.set(cache_key, encoded, generation)
+        return encoded.to_response(if_none_match)
+
+    def included(include):
+        try:
+            return includes.resolve(db_model, include)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+
+    def include_etag(session, spec, *parameters):
+        # embedded rows come from other tables, so the etag covers the version
+        # of every table the response is read from
+        versions = table_versions(session.connection(), spec.tables)
+        return collection_etag(name, versions, spec.key, *parameters)
+
+    def include_response(model_instance, etag):
+        return Response(
+            content=model_instance.model_dump_json(),
+            media_type="application/json",
+            headers={"ETag": etag},
+        )
+
+    def selected(fields, include=None):
+        """Parse ?fields= into the names of the columns to select, None for all."""
+        if fields is None:
+            return None
+        if include is not None:
+            raise HTTPException(
+                status_code=400, detail="fields cannot be combined with include"
+            )
+        names = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown = names - public_model.model_fields.keys()
+        if unknown:
+            raise HTTPException(
+                status_code=400, detail=f"unknown fields: {', '.join(sorted(unknown))}"
+            )
+        # the id is always returned, it is the cursor of the next page
+        names.add("id")
+        names = tuple(field for field in row_names if field in names)
+        return names if names != row_names else None
+
+    def encoded_columns(names):
+        """The columns read as tuples and encoded directly, None for ORM rows."""
+        if names is None and fast_serialization:
+            return row_names
+        return names
+
+    def columns(names):
+        return [db_model.__table__.c[name] for name in names]
+
+    def page_statement(after, limit, names=None, clauses=()):
+        # keyset pagination: seek past the cursor on the primary key instead of
+        # using OFFSET, so deep pages cost the same as the first one
+        statement = select(*columns(names)) if names else select(db_model)
+        statement = statement.where(*clauses).order_by(db_model.id).limit(limit + 1)
+        if after is not None:
+            statement = statement.where(db_model.id > after)
+        return statement
+
+    def page_content(result, limit):
+        next_cursor = result[limit - 1].id if len(result) > limit else None
+        return {"items": result[:limit], "next_cursor": next_cursor}
+
+    def included_page_response(spec, result, limit, etag):
+        page = Page[spec.model].model_validate(
+            page_content(result, limit), from_attributes=True
+        )
+        return include_response(page, etag)
+
+    def page_response(response, result, limit, etag, cache_key, generation):
+        page = page_content(result, limit)
+        if cache is not None:
+            page = page_model.model_validate(page, from_attributes=True)
+            return cached_response(cache_key, page, etag, generation)
+        response.headers["ETag"] = etag
+        return page
+
+    def tuple_page_response(encoded, rows, limit, etag, cache_key, generation):
+        # the columns come back as plain tuples and are encoded as they are,
+        # without ORM instances or validation by the public model
+        next_cursor = (
+            rows[limit - 1][encoded.index("id")] if len(rows) > limit else None
+        )
+        body = row_encoder(public_model, encoded).page(rows[:limit], next_cursor)
+        return encoded_response(body, etag, None, cache_key, generation)
+
+    def tuple_statement(encoded, id):
+        return select(
+            *columns(encoded), db_model.created_at, db_model.updated_at
+        ).where(db_model.id == id)
+
+    def tuple_row_response(
+        id, names, encoded, row, if_none_match, cache_key, generation
+    ):
+        *values, created_at, updated_at = row
+        etag = row_etag(id, created_at, updated_at)
+        if names is not None:
+            etag = make_etag(etag, names)
+        body = row_encoder(public_model, encoded).row(values)
+        return encoded_response(body, etag, if_none_match, cache_key, generation)
+
+    def batch_statements(ids, encoded):
+        # one IN query per chunk, sqlite limits the number of bound parameters
+        statement = select(*columns(encoded)) if encoded else select(db_model)
+        for chunk in chunked(ids):
+            yield statement.where(db_model.id.in_(chunk))
+
+    def batch_found(found, encoded, rows):
+        if encoded is not None:
+            index = encoded.index("id")
+            found.update((row[index], row) for row in rows)
+        else:
+            found.update((db_instance.id, db_instance) for db_instance in rows)
+
+    def batch_response(ids, found, encoded):
+        items = [found[id] for id in ids if id in found]
+        missing = [id for id in ids if id not in found]
+        if encoded is not None:
+            body = row_encoder(public_model, encoded).batch(items, missing)
+            return Response(content=body, media_type="application/json")
+        return {"items": items, "missing": missing}
+
+    def bulk_ids(statement, session, ids):
+        """
+        Run the statement on every chunk of ids, all in the session's
+        transaction. Nothing is written unless every id exists.
+        """
+        ids = list(dict.fromkeys(ids))
+        changed = set()
+        try:
+            for chunk in chunked(ids):
+                chunk_statement = statement.where(db_model.id.in_(chunk))
+                changed.update(
+                    session.execute(chunk_statement.returning(db_model.id)).scalars()
+                )
+        except IntegrityError as exc:
+            session.rollback()
+            raise conflict(exc)
+        missing = [id for id in ids if id not in changed]
+        if missing:
+            session.rollback()
+            raise HTTPException(
+                status_code=404,
+                detail={"message": f"{name} not found", "missing": missing},
+            )
+        return ids
+
+    def referencing_tables(session, ids):
+        # sqlite does not enforce foreign keys here, a set-based delete would
+        # silently leave the children of the deleted rows behind
+        tables = []
+        for table in SQLModel.metadata.sorted_tables:
+            for foreign_key in table.foreign_keys:
+                if foreign_key.column.table is not db_model.__table__:
+                    continue
+                for chunk in chunked(ids):
+                    statement = (
+                        select(foreign_key.parent)
+                        .where(foreign_key.parent.in_(chunk))
+                        .limit(1)
+                    )
+                    if session.execute(statement).first() is not None:
+                        tables.append(table.name)
+                        break
+        return tables
+
+    def update_rows(session, ids, patch):
+        values = patch.model_dump(exclude_unset=True)
+        if not values:
+            raise HTTPException(status_code=400, detail="patch sets no fields")
+        # updated_at is set by the statement, the rows are never loaded
+        statement = update_statement(db_model).values(**values, updated_at=utc_now())
+        ids = bulk_ids(statement, session, ids)
+        session.commit()
+        return ids
+
+    def delete_rows(session, ids):
+        ids = bulk_ids(delete_statement(db_model), session, ids)
+        # checked after the delete, the transaction then holds the write lock
+        # and no child can be added in between
+        tables = referencing_tables(session, ids)
+        if tables:
+            session.rollback()
+            raise HTTPException(
+                status_code=409,
+                detail=f"{name} is still referenced by {', '.join(tables)}",
+            )
+        session.commit()
+        return ids
+
+    def cascade_rows(session, ids, dry_run):
+        ids = list(dict.fromkeys(ids))
+        connection = session.connection()
+        missing = cascade.missing(connection, ids)
+        if missing:
+            raise HTTPException(
+                status_code=404,
+                detail={"message": f"{name} not found", "missing": missing},
+            )
+        if dry_run:
+            return cascade.count(connection, ids), {}
+        deleted = cascade.delete(connection, ids)
+        session.commit()
+        return {table: len(rows) for table, rows in deleted.items()}, deleted
+
+    def notify_deleted(deleted):
+        # children first, like the rows were deleted
+        for table, ids in reversed(deleted.items()):
+            if ids:
+                events.notify(table, "delete", ids)
+
+    def included_statement(spec, id):
+        return select(db_model).where(db_model.id == id).options(*spec.options)
+
+    def timestamps_statement(id):
+        # only the timestamps are needed to tell whether the client's copy is
+        # current, the full row is loaded when it is not
+        return select(db_model.created_at, db_model.updated_at).where(db_model.id == id)
+
+    def row_response(response, db_instance, cache_key, generation):
+        etag = row_etag(db_instance.id, db_instance.created_at, db_instance.updated_at)
+        if cache is not None:
+            public_instance = public_model.model_validate(db_instance)
+            return cached_response(cache_key, public_instance, etag, generation)
+        response.headers["ETag"] = etag
         return db_instance
 
     def create(instance: create_model):
         with Session(engine) as session:
-            session.add(instance)
-            session.commit()
-            session.refresh(instance)
-            return instance
+            db_instance = db_model(**instance.model_dump())
+            session.add(db_instance)
+            try:
+                session.commit()
+            except IntegrityError as exc:
+                session.rollback()
+                raise conflict(exc)
+            session.refresh(db_instance)
+        events.notify(name, "create", [db_instance.id])
+        return db_instance
+
+    def create_many(
+        instances: Annotated[list[dict[str, Any]], Body(max_length=MAX_BULK_SIZE)],
+        skip_invalid: bool = False,
+    ):
+        rows = []
+        row_indices = []
+        errors = []
+        for index, data in enumerate(instances):
+            try:
+                rows.append(create_model.model_validate(data).model_dump())
+                row_indices.append(index)
+            except ValidationError as exc:
+                errors.append(
+                    BulkCreateError(
+                        index=index,
+                        errors=exc.errors(include_url=False, include_context=False),
+                    )
+                )
+        if errors and not skip_invalid:
+            raise HTTPException(
+                status_code=422, detail=[error.model_dump() for error in errors]
+            )
+
+        ids = [None] * len(instances)
+        if rows:
+            # a single executemany in one transaction; RETURNING hands back the
+            # generated keys so no row has to be refreshed
+            statement = insert(db_model).returning(
+                db_model.id, sort_by_parameter_order=True
+            )
+            with Session(engine) as session:
+                # skip_invalid only skips rows failing validation, a constraint
+                # violation rejects the whole batch
+                try:
+                    new_ids = session.scalars(statement, rows).all()
+                    session.commit()
+                except IntegrityError as exc:
+                    session.rollback()
+                    raise conflict(exc)
+            for index, new_id in zip(row_indices, new_ids):
+                ids[index] = new_id
+            events.notify(name, "create", list(new_ids))
+        return BulkCreateResult(ids=ids, errors=errors)
+
+    def total_rows(session, filters):
+        clauses = list_filters.clauses(filters)
+        return total_count(
+            session.connection(), db_model.__table__, clauses, list_filters.key(filters)
+        )
+
+    def with_total(response, result, total):
+        # a returned Response does not pick up headers set on the injected one
+        target = result if isinstance(result, Response) else response
+        target.headers[TOTAL_COUNT_HEADER] = str(total)
+        return result
+
+    def read_page(response, after, limit, include, fields, if_none_match, filters):
+        names = selected(fields, include)
+        spec = included(include)
+        clauses = list_filters.clauses(filters)
+        filter_key = list_filters.key(filters)
+        if spec is not None:
+            with Session(engine) as session:
+                etag = include_etag(session, spec, after, limit, filter_key)
+                if etag_matches(if_none_match, etag):
+                    return not_modified(etag)
+                statement = page_statement(after, limit, clauses=clauses).options(
+                    *spec.options
+                )
+                result = list(session.exec(statement).all())
+                return included_page_response(spec, result, limit, etag)
+        cache_key = ("many", after, limit, names, filter_key)
+        hit, generation = cached(cache_key, if_none_match)
+        if hit is not None:
+            return hit
+        with Session(engine) as session:
+            # the version is read before the rows, so a concurrent write can
+            # only make the etag older than the body, never newer
+            version = table_version(session.connection(), table_name)
+            etag = collection_etag(name, version, after, limit, names, filter_key)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+            encoded = encoded_columns(names)
+            statement = page_statement(after, limit, encoded, clauses)
+            if encoded is not None:
+                rows = session.connection().execute(statement).all()
+                return tuple_page_response(
+                    encoded, rows, limit, etag, cache_key, generation
+                )
+            result = list(session.exec(statement).all())
+        return page_response(response, result, limit, etag, cache_key, generation)
 
-    def read_many():
+    def batch_get(
+        ids: Annotated[list[int], Body(max_length=MAX_BATCH_GET_SIZE)],
+        fields: str | None = None,
+    ):
+        encoded = encoded_columns(selected(fields))
+        # duplicates are returned once, where they were first requested
+        ids = list(dict.fromkeys(ids))
+        found = {}
         with Session(engine) as session:
-            result = list(session.exec(select(db_model)).all())
+            for statement in batch_statements(ids, encoded):
+                if encoded is not None:
+                    rows = session.connection().execute(statement).all()
+                else:
+                    rows = session.exec(statement).all()
+                batch_found(found, encoded, rows)
+        return batch_response(ids, found, encoded)
+
+    def read_many(
+        response: Response,
+        after: int | None = None,
+        limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+        include: str | None = None,
+        fields: str | None = None,
+        count: bool = False,
+        if_none_match: Annotated[str | None, Header()] = None,
+        **filters,
+    ):
+        result = read_page(
+            response, after, limit, include, fields, if_none_match, filters
+        )
+        if not count:
             return result
+        with Session(engine) as session:
+            total = total_rows(session, filters)
+        return with_total(response, result, total)
 
-    def read_one(id: int):
+    def count_rows(**filters):
         with Session(engine) as session:
-            return get(session, id)
+            total = total_rows(session, filters)
+        return Response(headers={TOTAL_COUNT_HEADER: str(total)})
+
+    def export(
+        format: Literal["ndjson", "json"] = "ndjson",
+        fields: str | None = None,
+        **filters,
+    ):
+        encoded = encoded_columns(selected(fields))
+        statement = (
+            (select(*columns(encoded)) if encoded else select(db_model))
+            .where(*list_filters.clauses(filters))
+            .order_by(db_model.id)
+            .execution_options(yield_per=EXPORT_CHUNK_SIZE)
+        )
+
+        def chunks():
+            # rows are fetched from the cursor one partition at a time and
+            # written out before the next one is read
+            with Session(engine) as session:
+                if encoded is not None:
+                    encoder = row_encoder(public_model, encoded)
+                    result = session.connection().execute(statement)
+                    for partition in result.partitions():
+                        yield [encoder.row(row).decode() for row in partition]
+                    return
+                for partition in session.exec(statement).partitions():
+                    yield [
+                        public_model.model_validate(db_instance).model_dump_json()
+                        for db_instance in partition
+                    ]
+
+        def ndjson():
+            for chunk in chunks():
+                yield "".join(row + "\n" for row in chunk)
+
+        def json_array():
+            separator = "["
+            for chunk in chunks():
+                yield separator + ",".join(chunk)
+                separator = ","
+            yield "[]" if separator == "[" else "]"
+
+        if format == "ndjson":
+            return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+        return StreamingResponse(json_array(), media_type="application/json")
+
+    def read_changes_since(
+        since: Annotated[int, Query(ge=0)] = 0,
+        limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+        format: Literal["json", "ndjson"] = "json",
+    ):
+        return read_changes(table_name, ChangePage[public_model], since, limit, format)
+
+    def read_one(
+        id: int,
+        response: Response,
+        include: str | None = None,
+        fields: str | None = None,
+        if_none_match: Annotated[str | None, Header()] = None,
+    ):
+        names = selected(fields, include)
+        spec = included(include)
+        if spec is not None:
+            with Session(engine) as session:
+                etag = include_etag(session, spec, id)
+                if etag_matches(if_none_match, etag):
+                    return not_modified(etag)
+                db_instance = session.exec(included_statement(spec, id)).first()
+                if db_instance is None:
+                    raise not_found()
+                return include_response(spec.model.model_validate(db_instance), etag)
+        cache_key = ("one", id, names)
+        hit, generation = cached(cache_key, if_none_match)
+        if hit is not None:
+            return hit
+        with Session(engine) as session:
+            encoded = encoded_columns(names)
+            if encoded is not None:
+                statement = tuple_statement(encoded, id)
+                row = session.connection().execute(statement).first()
+                if row is None:
+                    raise not_found()
+                return tuple_row_response(
+                    id, names, encoded, row, if_none_match, cache_key, generation
+                )
+            if if_none_match is not None:
+                timestamps = session.exec(timestamps_statement(id)).first()
+                if timestamps is None:
+                    raise not_found()
+                etag = row_etag(id, *timestamps)
+                if etag_matches(if_none_match, etag):
+                    return not_modified(etag)
+            db_instance = get(session, id)
+        return row_response(response, db_instance, cache_key, generation)
 
     def update(id: int, patch: update_model):
         with Session(engine) as session:
@@ -96,21 +698,296 @@ def crud_factory(
             patch_data = patch.model_dump(exclude_unset=True)
             db_instance.sqlmodel_update(patch_data)
             session.add(db_instance)
-            session.commit()
+            try:
+                session.commit()
+            except IntegrityError as exc:
+                session.rollback()
+                raise conflict(exc)
             session.refresh(db_instance)
-            return db_instance
+        events.notify(name, "update", [id])
+        return db_instance
 
     def delete(id: int):
         with Session(engine) as session:
-            db_instance = get(session, id)
-            session.delete(db_instance)
-            session.commit()
+            # read before the row is gone, the delete never loads its children
+            public_instance = public_model.model_validate(get(session, id))
+            delete_rows(session, [id])
+        events.notify(name, "delete", [id])
+        return public_instance
+
+    def update_many(
+        ids: Annotated[list[int], Body(max_length=MAX_BULK_SIZE)],
+        patch: Annotated[update_model, Body()],
+    ):
+        with Session(engine) as session:
+            ids = update_rows(session, ids, patch)
+        events.notify(name, "update", ids)
+        return BulkUpdateResult(updated=len(ids))
+
+    def delete_many(ids: Annotated[list[int], Body(max_length=MAX_BULK_SIZE)]):
+        with Session(engine) as session:
+            ids = delete_rows(session, ids)
+        events.notify(name, "delete", ids)
+        return BulkDeleteResult(deleted=len(ids))
+
+    def delete_cascade(
+        ids: Annotated[list[int], Body(max_length=MAX_BULK_SIZE)],
+        dry_run: bool = False,
+    ):
+        with Session(engine) as session:
+            counts, deleted = cascade_rows(session, ids, dry_run)
+        notify_deleted(deleted)
+        return CascadeDeleteResult(dry_run=dry_run, deleted=counts)
+
+    if async_engine is not None:
+        # the same endpoints on an AsyncEngine, so requests wait on the
+        # database in the event loop instead of holding a threadpool worker
+
+        async def create(instance: create_model):
+            async with AsyncSession(async_engine) as session:
+                db_instance = db_model(**instance.model_dump())
+                session.add(db_instance)
+                try:
+                    await session.commit()
+                except IntegrityError as exc:
+                    await session.rollback()
+                    raise conflict(exc)
+                await session.refresh(db_instance)
+            await run_in_threadpool(events.notify, name, "create", [db_instance.id])
             return db_instance
 
+        async def read_page(
+            response, after, limit, include, fields, if_none_match, filters
+        ):
+            names = selected(fields, include)
+            spec = included(include)
+            clauses = list_filters.clauses(filters)
+            filter_key = list_filters.key(filters)
+            if spec is not None:
+                async with AsyncSession(async_engine) as session:
+                    etag = await session.run_sync(
+                        include_etag, spec, after, limit, filter_key
+                    )
+                    if etag_matches(if_none_match, etag):
+                        return not_modified(etag)
+                    statement = page_statement(after, limit, clauses=clauses).options(
+                        *spec.options
+                    )
+                    result = list((await session.exec(statement)).all())
+                    return included_page_response(spec, result, limit, etag)
+            cache_key = ("many", after, limit, names, filter_key)
+            hit, generation = cached(cache_key, if_none_match)
+            if hit is not None:
+                return hit
+            async with AsyncSession(async_engine) as session:
+                version = await session.run_sync(
+                    lambda session: table_version(session.connection(), table_name)
+                )
+                etag = collection_etag(name, version, after, limit, names, filter_key)
+                if etag_matches(if_none_match, etag):
+                    return not_modified(etag)
+                encoded = encoded_columns(names)
+                statement = page_statement(after, limit, encoded, clauses)
+                if encoded is not None:
+                    connection = await session.connection()
+                    rows = (await connection.execute(statement)).all()
+                    return tuple_page_response(
+                        encoded, rows, limit, etag, cache_key, generation
+                    )
+                result = list((await session.exec(statement)).all())
+            return page_response(response, result, limit, etag, cache_key, generation)
+
+        async def batch_get(
+            ids: Annotated[list[int], Body(max_length=MAX_BATCH_GET_SIZE)],
+            fields: str | None = None,
+        ):
+            encoded = encoded_columns(selected(fields))
+            ids = list(dict.fromkeys(ids))
+            found = {}
+            async with AsyncSession(async_engine) as session:
+                for statement in batch_statements(ids, encoded):
+                    if encoded is not None:
+                        connection = await session.connection()
+                        rows = (await connection.execute(statement)).all()
+                    else:
+                        rows = (await session.exec(statement)).all()
+                    batch_found(found, encoded, rows)
+            return batch_response(ids, found, encoded)
+
+        async def read_many(
+            response: Response,
+            after: int | None = None,
+            limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+            include: str | None = None,
+            fields: str | None = None,
+            count: bool = False,
+            if_none_match: Annotated[str | None, Header()] = None,
+            **filters,
+        ):
+            result = await read_page(
+                response, after, limit, include, fields, if_none_match, filters
+            )
+            if not count:
+                return result
+            async with AsyncSession(async_engine) as session:
+                total = await session.run_sync(total_rows, filters)
+            return with_total(response, result, total)
+
+        async def count_rows(**filters):
+            async with AsyncSession(async_engine) as session:
+                total = await session.run_sync(total_rows, filters)
+            return Response(headers={TOTAL_COUNT_HEADER: str(total)})
+
+        async def read_one(
+            id: int,
+            response: Response,
+            include: str | None = None,
+            fields: str | None = None,
+            if_none_match: Annotated[str | None, Header()] = None,
+        ):
+            names = selected(fields, include)
+            spec = included(include)
+            if spec is not None:
+                async with AsyncSession(async_engine) as session:
+                    etag = await session.run_sync(include_etag, spec, id)
+                    if etag_matches(if_none_match, etag):
+                        return not_modified(etag)
+                    statement = included_statement(spec, id)
+                    db_instance = (await session.exec(statement)).first()
+                    if db_instance is None:
+                        raise not_found()
+                    model_instance = spec.model.model_validate(db_instance)
+                    return include_response(model_instance, etag)
+            cache_key = ("one", id, names)
+            hit, generation = cached(cache_key, if_none_match)
+            if hit is not None:
+                return hit
+            async with AsyncSession(async_engine) as session:
+                encoded = encoded_columns(names)
+                if encoded is not None:
+                    connection = await session.connection()
+                    statement = tuple_statement(encoded, id)
+                    row = (await connection.execute(statement)).first()
+                    if row is None:
+                        raise not_found()
+                    return tuple_row_response(
+                        id, names, encoded, row, if_none_match, cache_key, generation
+                    )
+                if if_none_match is not None:
+                    timestamps = (await session.exec(timestamps_statement(id))).first()
+                    if timestamps is None:
+                        raise not_found()
+                    etag = row_etag(id, *timestamps)
+                    if etag_matches(if_none_match, etag):
+                        return not_modified(etag)
+                db_instance = await session.get(db_model, id)
+                if not db_instance:
+                    raise not_found()
+            return row_response(response, db_instance, cache_key, generation)
+
+        async def update(id: int, patch: update_model):
+            async with AsyncSession(async_engine) as session:
+                db_instance = await session.get(db_model, id)
+                if not db_instance:
+                    raise not_found()
+                db_instance.sqlmodel_update(patch.model_dump(exclude_unset=True))
+                session.add(db_instance)
+                try:
+                    await session.commit()
+                except IntegrityError as exc:
+                    await session.rollback()
+                    raise conflict(exc)
+                await session.refresh(db_instance)
+            await run_in_threadpool(events.notify, name, "update", [id])
+            return db_instance
+
+        async def delete(id: int):
+            async with AsyncSession(async_engine) as session:
+                db_instance = await session.get(db_model, id)
+                if not db_instance:
+                    raise not_found()
+                public_instance = public_model.model_validate(db_instance)
+                await session.run_sync(delete_rows, [id])
+            await run_in_threadpool(events.notify, name, "delete", [id])
+            return public_instance
+
+        async def update_many(
+            ids: Annotated[list[int], Body(max_length=MAX_BULK_SIZE)],
+            patch: Annotated[update_model, Body()],
+        ):
+            async with AsyncSession(async_engine) as session:
+                ids = await session.run_sync(update_rows, ids, patch)
+            await run_in_threadpool(events.notify, name, "update", ids)
+            return BulkUpdateResult(updated=len(ids))
+
+        async def delete_many(
+            ids: Annotated[list[int], Body(max_length=MAX_BULK_SIZE)],
+        ):
+            async with AsyncSession(async_engine) as session:
+                ids = await session.run_sync(delete_rows, ids)
+            await run_in_threadpool(events.notify, name, "delete", ids)
+            return BulkDeleteResult(deleted=len(ids))
+
+        async def delete_cascade(
+            ids: Annotated[list[int], Body(max_length=MAX_BULK_SIZE)],
+            dry_run: bool = False,
+        ):
+            async with AsyncSession(async_engine) as session:
+                counts, deleted = await session.run_sync(cascade_rows, ids, dry_run)
+            await run_in_threadpool(notify_deleted, deleted)
+            return CascadeDeleteResult(dry_run=dry_run, deleted=counts)
+
+    if cache is not None:
+
+        def invalidate(source, action, ids):
+            # any page may contain the written rows, single rows are only
+            # dropped for the written ids
+            stale = set(ids)
+            cache.discard(lambda key: key[0] == "many" or key[1] in stale)
+
+        events.listen([name], invalidate)
+
     app.post(endpoint, response_model=public_model, name=f"{name} create")(create)
-    app.get(endpoint, response_model=list[public_model], name=f"{name} read many")(
-        read_many
+    app.post(
+        endpoint + "/bulk", response_model=BulkCreateResult, name=f"{name} bulk create"
+    )(create_many)
+    app.post(
+        endpoint + "/batch_get",
+        response_model=BatchGetResult[public_model],
+        name=f"{name} batch get",
+    )(batch_get)
+    # before the routes with an id, which would match /bulk too
+    app.patch(
+        endpoint + "/bulk", response_model=BulkUpdateResult, name=f"{name} bulk update"
+    )(update_many)
+    app.delete(
+        endpoint + "/bulk", response_model=BulkDeleteResult, name=f"{name} bulk delete"
+    )(delete_many)
+    if cascade is not None:
+        app.delete(
+            endpoint + "/cascade",
+            response_model=CascadeDeleteResult,
+            name=f"{name} cascade delete",
+        )(delete_cascade)
+    # filters on columns without an index are refused before the endpoint runs
+    reject_unindexed = [Depends(list_filters.reject_unindexed)]
+    app.get(
+        endpoint,
+        response_model=Page[public_model],
+        name=f"{name} read many",
+        dependencies=reject_unindexed,
+    )(list_filters.add_to(read_many))
+    app.head(endpoint, name=f"{name} count", dependencies=reject_unindexed)(
+        list_filters.add_to(count_rows)
+    )
+    app.get(endpoint + "/export", name=f"{name} export", dependencies=reject_unindexed)(
+        list_filters.add_to(export)
     )
+    app.get(
+        endpoint + "/changes",
+        response_model=ChangePage[public_model],
+        name=f"{name} changes",
+    )(read_changes_since)
     app.get(endpoint_with_id, response_model=public_model, name=f"{name} read one")(
         read_one
     )
@@ -156,11 +1033,130 @@ for setup in [
         LocalizedCardNameUpdate,
     ],
 ]:
-    crud_factory(*setup)
+    cache = (
+        ResponseCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL)
+        if setup[0] in CACHED_RESOURCES
+        else None
+    )
+    crud_factory(
+        *setup,
+        cache=cache,
+        async_engine=async_engine,
+        fast_serialization=get_settings().fast_serialization,
+    )
+    if cache is not None:
+        caches[setup[0]] = cache
+
+
+def read_all_changes(
+    since: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+    format: Literal["json", "ndjson"] = "json",
+):
+    return read_changes(None, ChangePage[PublicModel], since, limit, format)
+
+
+app.get("/changes", response_model=ChangePage[PublicModel], name="changes")(
+    read_all_changes
+)
+
+
+def cache_stats():
+    return {name: cache.stats() for name, cache in caches.items()}
+
+
+app.get("/cache/stats", name="cache stats")(cache_stats)
+
+
+def read_metrics():
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
+app.get("/metrics", name="metrics", include_in_schema=False)(read_metrics)
+
+
+app.get(
+    "/search/cards", response_model=list[search.CardSearchResult], name="search cards"
+)(search.search_cards)
+app.get(
+    "/search/sets", response_model=list[search.SetSearchResult], name="search sets"
+)(search.search_sets)
+app.get("/match/cards", response_model=list[fuzzy.NameMatch], name="match cards")(
+    fuzzy.match_cards
+)
+app.get("/match/sets", response_model=list[fuzzy.NameMatch], name="match sets")(
+    fuzzy.match_sets
+)
+app.get("/resolve/card", response_model=resolver.ResolvedCard, name="resolve card")(
+    resolver.resolve_card
+)
+app.post(
+    "/resolve/cards", response_model=list[resolver.ResolvedCard], name="resolve cards"
+)(resolver.resolve_cards)
+app.get(
+    "/card_representation/{id}/equivalents",
+    response_model=equivalents.CardEquivalents,
+    name="card_representation equivalents",
+)(equivalents.read_equivalents)
+app.post(
+    "/card_representation/equivalents",
+    response_model=equivalents.EquivalentsBatch,
+    name="card_representation batch equivalents",
+)(equivalents.read_many_equivalents)
+app.get(
+    "/set_representation/{id}/full",
+    response_model=snapshots.snapshot_model(),
+    name="set_representation full",
+)(snapshots.read_full)
+app.post("/import", response_model=ingest.ImportResult, name="import")(
+    ingest.import_dump
+)
 
 
 if __name__ == "__main__":
-    create_db_and_tables()
+    parser = argparse.ArgumentParser(prog="python -m tcgindex.main")
+    parser.add_argument(
+        "command",
+        nargs="?",
+        default="init",
+        choices=["init", "upgrade", "import"],
+        help="init recreates the database, upgrade adds missing tables and indexes, "
+        "import loads a catalog dump",
+    )
+    parser.add_argument("path", nargs="?", type=Path, help="dump file to import")
+    parser.add_argument("--format", choices=["ndjson", "json", "csv"])
+    parser.add_argument(
+        "--checkpoint",
+        type=Path,
+        help="resume from and record progress in this file, defaults to "
+        "<path>.checkpoint",
+    )
+    parser.add_argument("--batch-size", type=int, default=ingest.DEFAULT_BATCH_SIZE)
+    parser.add_argument("--skip-invalid", action="store_true")
+    args = parser.parse_args()
+    if args.command == "upgrade":
+        upgrade_db()
+    elif args.command == "import":
+        if args.path is None:
+            parser.error("import needs the path of a dump file")
+        result = ingest.import_file(
+            args.path,
+            args.format,
+            checkpoint=args.checkpoint or Path(f"{args.path}.checkpoint"),
+            batch_size=args.batch_size,
+            skip_invalid=args.skip_invalid,
+            progress=lambda result: print(
+                f"{result.resumed_from + result.records} records, "
+                f"{result.set_representations} sets, "
+                f"{result.card_representations} cards, "
+                f"{result.localized_names} localized names, "
+                f"{result.skipped} skipped",
+                file=sys.stderr,
+            ),
+        )
+        print(result.model_dump_json(indent=2))
+    else:
+        create_db_and_tables()
 
 
 if False:
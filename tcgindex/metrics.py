@@ -0,0 +1,239 @@
+"""
+Request and SQL metrics in the Prometheus text format, served on /metrics.
+
+Routes are instrumented by InstrumentedRoute, which the app uses as its route
+class, so every observation is labelled with the route template, e.g.
+/card_representation/{id}, and not with the requested path. Statements are
+counted by cursor events on the engines and attributed to the request that runs
+them through a context variable, which is copied into the threadpool and into
+the greenlets of the async engine.
+
+Each process keeps its own metrics. Observing a request costs one lock and a
+few bisects, so the instrumentation can stay on under full load.
+"""
+
+import bisect
+import contextvars
+import dataclasses
+import threading
+import time
+
+from fastapi.routing import APIRoute
+from sqlalchemy import Engine, event
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PREFIX = "tcgindex"
+DURATION_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+
+@dataclasses.dataclass
+class RequestStats:
+    statements: int = 0
+    db_seconds: float = 0.0
+
+
+current_request: contextvars.ContextVar[RequestStats | None] = contextvars.ContextVar(
+    "current_request", default=None
+)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        # one slot per bucket plus +Inf, not cumulative until rendered
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        # the upper bounds are inclusive, like Prometheus' le
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name: str, labels: str):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f"{name}_sum{{{labels}}} {self.sum}"
+        yield f"{name}_count{{{labels}}} {self.count}"
+
+
+class RouteMetrics:
+    def __init__(self):
+        self.in_flight = 0
+        self.statuses: dict[int, int] = {}
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+        self.statements = Histogram(STATEMENT_BUCKETS)
+        self.db_duration = Histogram(DURATION_BUCKETS)
+
+
+# name, type, help text and how to read the metric from a RouteMetrics
+METRICS = (
+    (
+        "http_requests_in_flight",
+        "gauge",
+        "Requests being handled.",
+        lambda route: route.in_flight,
+    ),
+    (
+        "http_requests_total",
+        "counter",
+        "Handled requests by status.",
+        lambda route: route.statuses,
+    ),
+    (
+        "http_request_duration_seconds",
+        "histogram",
+        "Time from routing to the last byte of the response.",
+        lambda route: route.duration,
+    ),
+    (
+        "http_response_size_bytes",
+        "histogram",
+        "Size of the response body.",
+        lambda route: route.size,
+    ),
+    (
+        "db_statements_per_request",
+        "histogram",
+        "SQL statements executed by a request.",
+        lambda route: route.statements,
+    ),
+    (
+        "db_duration_seconds",
+        "histogram",
+        "Time a request spent executing SQL statements.",
+        lambda route: route.db_duration,
+    ),
+)
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes: dict[tuple[str, str], RouteMetrics] = {}
+
+    def started(self, method: str, path: str) -> RouteMetrics:
+        with self.lock:
+            route = self.routes.get((method, path))
+            if route is None:
+                route = self.routes[(method, path)] = RouteMetrics()
+            route.in_flight += 1
+        return route
+
+    def finished(
+        self,
+        route: RouteMetrics,
+        status: int,
+        seconds: float,
+        size: int,
+        stats: RequestStats,
+    ):
+        with self.lock:
+            route.in_flight -= 1
+            route.statuses[status] = route.statuses.get(status, 0) + 1
+            route.duration.observe(seconds)
+            route.size.observe(size)
+            route.statements.observe(stats.statements)
+            route.db_duration.observe(stats.db_seconds)
+
+    def render(self) -> str:
+        lines = []
+        with self.lock:
+            routes = sorted(self.routes.items())
+            for name, kind, description, read in METRICS:
+                name = f"{PREFIX}_{name}"
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} {kind}")
+                for (method, path), route in routes:
+                    labels = f'method="{method}",route="{escape(path)}"'
+                    value = read(route)
+                    if kind == "histogram":
+                        lines.extend(value.samples(name, labels))
+                    elif kind == "counter":
+                        lines.extend(
+                            f'{name}{{{labels},status="{status}"}} {count}'
+                            for status, count in sorted(value.items())
+                        )
+                    else:
+                        lines.append(f"{name}{{{labels}}} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class InstrumentedRoute(APIRoute):
+    """Route class that records every request it handles in the registry."""
+
+    async def handle(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await super().handle(scope, receive, send)
+        route = registry.started(scope["method"], self.path)
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status = 500
+        size = 0
+
+        async def measured_send(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await super().handle(scope, receive, measured_send)
+        finally:
+            seconds = time.perf_counter() - start
+            current_request.reset(token)
+            registry.finished(route, status, seconds, size, stats)
+
+
+def instrument(engine: Engine):
+    """Count the statements an engine executes and their time per request."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(
+        connection, cursor, statement, parameters, context, executemany
+    ):
+        if current_request.get() is not None:
+            # kept on the execution context, a failed statement leaves nothing
+            # behind on the connection
+            context.query_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(
+        connection, cursor, statement, parameters, context, executemany
+    ):
+        stats = current_request.get()
+        start = getattr(context, "query_start", None)
+        if stats is None or start is None:
+            return
+        stats.statements += 1
+        stats.db_seconds += time.perf_counter() - start
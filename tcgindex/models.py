@@ -1,7 +1,8 @@
 import datetime
-from typing import Any
+from typing import Any, Generic, Literal, TypeVar
 
-from sqlalchemy import DateTime, func, text
+from pydantic import BaseModel
+from sqlalchemy import DateTime, Index, text
 from sqlmodel import JSON, Column, Field, Relationship, SQLModel
 
 
@@ -11,6 +12,67 @@ class PublicModel(SQLModel):
     updated_at: datetime.datetime | None
 
 
+PublicModelT = TypeVar("PublicModelT", bound=PublicModel)
+
+
+def utc_now() -> datetime.datetime:
+    # with microseconds, so every update changes updated_at and with it the
+    # row's ETag, CURRENT_TIMESTAMP only has whole seconds
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+class Page(BaseModel, Generic[PublicModelT]):
+    items: list[PublicModelT]
+    next_cursor: int | None
+
+
+class BatchGetResult(BaseModel, Generic[PublicModelT]):
+    # in the requested order
+    items: list[PublicModelT]
+    missing: list[int]
+
+
+class BulkCreateError(BaseModel):
+    index: int
+    errors: list[dict[str, Any]]
+
+
+class BulkCreateResult(BaseModel):
+    ids: list[int | None]
+    errors: list[BulkCreateError]
+
+
+class BulkUpdateResult(BaseModel):
+    updated: int
+
+
+class BulkDeleteResult(BaseModel):
+    deleted: int
+
+
+class CascadeDeleteResult(BaseModel):
+    dry_run: bool
+    # rows per table, the deleted resource's own table first
+    deleted: dict[str, int]
+
+
+class Change(BaseModel, Generic[PublicModelT]):
+    seq: int
+    table: str
+    id: int
+    action: Literal["create", "update", "delete"]
+    changed_at: datetime.datetime
+    # the row as it is now, None for deletes
+    row: PublicModelT | None
+
+
+class ChangePage(BaseModel, Generic[PublicModelT]):
+    items: list[Change[PublicModelT]]
+    # pass as since to resume, also when no change was returned
+    cursor: int
+    has_more: bool
+
+
 # CATALOG
 class CatalogBase(SQLModel):
     name: str = Field(unique=True)
@@ -24,7 +86,7 @@ class Catalog(CatalogBase, table=True):
         }
     )
     updated_at: datetime.datetime | None = Field(
-        sa_column=Column(DateTime(), onupdate=func.now())
+        sa_column=Column(DateTime(), onupdate=utc_now, index=True)
     )
     set_representations: list["SetRepresentation"] = Relationship(
         back_populates="catalog"
@@ -45,7 +107,7 @@ class CatalogUpdate(CatalogBase):
 
 # GAME
 class GameBase(SQLModel):
-    name: str
+    name: str = Field(index=True)
 
 
 class Game(GameBase, table=True):
@@ -56,10 +118,13 @@ class Game(GameBase, table=True):
         }
     )
     updated_at: datetime.datetime | None = Field(
-        sa_column=Column(DateTime(), onupdate=func.now())
+        sa_column=Column(DateTime(), onupdate=utc_now, index=True)
     )
     proto_sets: list["ProtoSet"] = Relationship(back_populates="game")
     proto_cards: list["ProtoCard"] = Relationship(back_populates="game")
+    card_representations: list["CardRepresentation"] = Relationship(
+        back_populates="game"
+    )
 
 
 class GamePublic(PublicModel, GameBase):
@@ -76,8 +141,8 @@ class GameUpdate(GameBase):
 
 # PROTO SET
 class ProtoSetBase(SQLModel):
-    game_id: int = Field(foreign_key="game.id")
-    name: str
+    game_id: int = Field(foreign_key="game.id", index=True)
+    name: str = Field(index=True)
 
 
 class ProtoSet(ProtoSetBase, table=True):
@@ -89,7 +154,7 @@ class ProtoSet(ProtoSetBase, table=True):
         }
     )
     updated_at: datetime.datetime | None = Field(
-        sa_column=Column(DateTime(), onupdate=func.now())
+        sa_column=Column(DateTime(), onupdate=utc_now, index=True)
     )
     game: Game = Relationship(back_populates="proto_sets")
     set_representations: list["SetRepresentation"] = Relationship(
@@ -112,16 +177,25 @@ class ProtoSetUpdate(ProtoSetBase):
 
 # SET REPRESENTATION
 class SetRepresentationBase(SQLModel):
-    proto_set_id: int = Field(foreign_key="proto_set.id")
+    proto_set_id: int = Field(foreign_key="proto_set.id", index=True)
+    # indexed as the leading column of the composite unique index below
     catalog_id: int = Field(foreign_key="catalog.id")
-    name: str
-    identifier: str
+    name: str = Field(index=True)
+    identifier: str = Field(index=True)
     size: int
     # catalog_data: dict[str, Any] = Field(sa_column=Column(JSON))
 
 
 class SetRepresentation(SetRepresentationBase, table=True):
     __tablename__ = "set_representation"
+    __table_args__ = (
+        Index(
+            "ix_set_representation_catalog_id_identifier",
+            "catalog_id",
+            "identifier",
+            unique=True,
+        ),
+    )
     id: int | None = Field(default=None, primary_key=True)
     created_at: datetime.datetime = Field(
         sa_column_kwargs={
@@ -129,7 +203,7 @@ class SetRepresentation(SetRepresentationBase, table=True):
         }
     )
     updated_at: datetime.datetime | None = Field(
-        sa_column=Column(DateTime(), onupdate=func.now())
+        sa_column=Column(DateTime(), onupdate=utc_now, index=True)
     )
     proto_set: ProtoSet = Relationship(back_populates="set_representations")
     catalog: Catalog = Relationship(back_populates="set_representations")
@@ -160,13 +234,22 @@ class SetRepresentationUpdate(SetRepresentationBase):
 
 # LOCALIZED SET NAME
 class LocalizedSetNameBase(SQLModel):
+    # indexed as the leading column of the composite unique index below
     set_representation_id: int = Field(foreign_key="set_representation.id")
-    name: str
-    locale: str
+    name: str = Field(index=True)
+    locale: str = Field(index=True)
 
 
 class LocalizedSetName(LocalizedSetNameBase, table=True):
     __tablename__ = "localized_set_name"
+    __table_args__ = (
+        Index(
+            "ix_localized_set_name_set_representation_id_locale",
+            "set_representation_id",
+            "locale",
+            unique=True,
+        ),
+    )
     id: int | None = Field(default=None, primary_key=True)
     created_at: datetime.datetime = Field(
         sa_column_kwargs={
@@ -174,7 +257,7 @@ class LocalizedSetName(LocalizedSetNameBase, table=True):
         }
     )
     updated_at: datetime.datetime | None = Field(
-        sa_column=Column(DateTime(), onupdate=func.now())
+        sa_column=Column(DateTime(), onupdate=utc_now, index=True)
     )
     set_representation: SetRepresentation = Relationship(
         back_populates="localized_names"
@@ -204,8 +287,8 @@ class ProtoCardBase(SQLModel):
     CardRepresentation -> ProtoCard -/-> ProtoSet to ensure data integitry
     """
 
-    game_id: int = Field(foreign_key="game.id")
-    name: str
+    game_id: int = Field(foreign_key="game.id", index=True)
+    name: str = Field(index=True)
 
 
 class ProtoCard(ProtoCardBase, table=True):
@@ -217,7 +300,7 @@ class ProtoCard(ProtoCardBase, table=True):
         }
     )
     updated_at: datetime.datetime | None = Field(
-        sa_column=Column(DateTime(), onupdate=func.now())
+        sa_column=Column(DateTime(), onupdate=utc_now, index=True)
     )
     game: Game = Relationship(back_populates="proto_cards")
     card_representations: list["CardRepresentation"] = Relationship(
@@ -240,16 +323,25 @@ class ProtoCardUpdate(ProtoCardBase):
 
 # CARD REPRESENTATION
 class CardRepresentationBase(SQLModel):
-    game_id: int = Field(foreign_key="game.id")
-    proto_card_id: int = Field(foreign_key="proto_card.id")
+    game_id: int = Field(foreign_key="game.id", index=True)
+    proto_card_id: int = Field(foreign_key="proto_card.id", index=True)
+    # indexed as the leading column of the composite unique index below
     set_representation_id: int = Field(foreign_key="set_representation.id")
-    name: str
-    identifier: str
+    name: str = Field(index=True)
+    identifier: str = Field(index=True)
     # catalog_data: dict[str, Any] = Field(sa_column=Column(JSON))
 
 
 class CardRepresentation(CardRepresentationBase, table=True):
     __tablename__ = "card_representation"
+    __table_args__ = (
+        Index(
+            "ix_card_representation_set_representation_id_identifier",
+            "set_representation_id",
+            "identifier",
+            unique=True,
+        ),
+    )
     id: int | None = Field(default=None, primary_key=True)
     created_at: datetime.datetime = Field(
         sa_column_kwargs={
@@ -257,10 +349,10 @@ class CardRepresentation(CardRepresentationBase, table=True):
         }
     )
     updated_at: datetime.datetime | None = Field(
-        sa_column=Column(DateTime(), onupdate=func.now())
+        sa_column=Column(DateTime(), onupdate=utc_now, index=True)
     )
-    game: Game = Relationship(back_populates="game")
-    prototype: ProtoCard = Relationship(back_populates="representations")
+    game: Game = Relationship(back_populates="card_representations")
+    proto_card: ProtoCard = Relationship(back_populates="card_representations")
     set_representation: SetRepresentation = Relationship(
         back_populates="card_representations"
     )
@@ -288,13 +380,22 @@ class CardRepresentationUpdate(CardRepresentationBase):
 
 # LOCALIZED CARD NAME
 class LocalizedCardNameBase(SQLModel):
+    # indexed as the leading column of the composite unique index below
     card_representation_id: int = Field(foreign_key="card_representation.id")
-    name: str
-    locale: str
+    name: str = Field(index=True)
+    locale: str = Field(index=True)
 
 
 class LocalizedCardName(LocalizedCardNameBase, table=True):
     __tablename__ = "localized_card_name"
+    __table_args__ = (
+        Index(
+            "ix_localized_card_name_card_representation_id_locale",
+            "card_representation_id",
+            "locale",
+            unique=True,
+        ),
+    )
     id: int | None = Field(default=None, primary_key=True)
     created_at: datetime.datetime = Field(
         sa_column_kwargs={
@@ -302,7 +403,7 @@ class LocalizedCardName(LocalizedCardNameBase, table=True):
         }
     )
     updated_at: datetime.datetime | None = Field(
-        sa_column=Column(DateTime(), onupdate=func.now())
+        sa_column=Column(DateTime(), onupdate=utc_now, index=True)
     )
     card_representation: CardRepresentation = Relationship(
         back_populates="localized_names"
@@ -0,0 +1,139 @@
+import threading
+from typing import Annotated, Hashable
+
+from fastapi import Body, HTTPException
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlmodel import SQLModel
+
+from tcgindex import events
+from tcgindex.database import chunked, get_engine
+
+MAX_BATCH_SIZE = 10000
+
+
+class CardKey(BaseModel):
+    catalog: str
+    set_identifier: str
+    card_identifier: str
+
+
+class ResolvedCard(CardKey):
+    catalog_id: int | None
+    set_representation_id: int | None
+    card_representation_id: int | None
+
+
+class KeyMap:
+    """A dict from natural key to id that also remembers the key of every id."""
+
+    def __init__(self):
+        self.ids: dict[Hashable, int] = {}
+        self.keys: dict[int, Hashable] = {}
+
+    def put(self, id: int, key: Hashable):
+        self.drop(id)
+        self.ids[key] = id
+        self.keys[id] = key
+
+    def drop(self, id: int):
+        key = self.keys.pop(id, None)
+        if key is not None and self.ids.get(key) == id:
+            del self.ids[key]
+
+    def clear(self):
+        self.ids.clear()
+        self.keys.clear()
+
+
+class IdentifierIndex:
+    """
+    Resolves (catalog name, set identifier, card identifier) with three hash
+    lookups: catalog name -> catalog id, (catalog id, set identifier) -> set
+    representation id and (set representation id, card identifier) -> card
+    representation id. Keying cards on the set id keeps a set rename from
+    touching its cards.
+    """
+
+    # resource -> (columns forming the key, attribute holding the KeyMap)
+    sources = {
+        "catalog": (("name",), "catalogs"),
+        "set_representation": (("catalog_id", "identifier"), "sets"),
+        "card_representation": (("set_representation_id", "identifier"), "cards"),
+    }
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.loaded = False
+        self.catalogs = KeyMap()
+        self.sets = KeyMap()
+        self.cards = KeyMap()
+        events.listen(list(self.sources), self.on_change)
+
+    def statement(self, source: str):
+        table = SQLModel.metadata.tables[source]
+        key_columns, _ = self.sources[source]
+        return table, select(table.c.id, *(table.c[name] for name in key_columns))
+
+    def put_rows(self, source: str, rows):
+        key_map = getattr(self, self.sources[source][1])
+        for id, *key in rows:
+            key_map.put(id, key[0] if len(key) == 1 else tuple(key))
+
+    def load(self):
+        with self.lock:
+            if self.loaded:
+                return
+            with get_engine().connect() as connection:
+                for source in self.sources:
+                    _, statement = self.statement(source)
+                    self.put_rows(source, connection.execute(statement))
+            self.loaded = True
+
+    def on_change(self, source: str, action: events.Action, ids: list[int]):
+        with self.lock:
+            if not self.loaded:
+                return
+            if action == "delete":
+                key_map = getattr(self, self.sources[source][1])
+                for id in ids:
+                    key_map.drop(id)
+                return
+            table, statement = self.statement(source)
+            with get_engine().connect() as connection:
+                for chunk in chunked(ids):
+                    rows = connection.execute(statement.where(table.c.id.in_(chunk)))
+                    self.put_rows(source, rows)
+
+    def resolve(self, key: CardKey) -> ResolvedCard:
+        catalog_id = self.catalogs.ids.get(key.catalog)
+        set_id = self.sets.ids.get((catalog_id, key.set_identifier))
+        card_id = self.cards.ids.get((set_id, key.card_identifier))
+        return ResolvedCard(
+            **key.model_dump(),
+            catalog_id=catalog_id,
+            set_representation_id=set_id,
+            card_representation_id=card_id,
+        )
+
+
+identifier_index = IdentifierIndex()
+
+
+def resolve_card(catalog: str, set_identifier: str, card_identifier: str):
+    identifier_index.load()
+    resolved = identifier_index.resolve(
+        CardKey(
+            catalog=catalog,
+            set_identifier=set_identifier,
+            card_identifier=card_identifier,
+        )
+    )
+    if resolved.card_representation_id is None:
+        raise HTTPException(status_code=404, detail="card_representation not found")
+    return resolved
+
+
+def resolve_cards(keys: Annotated[list[CardKey], Body(max_length=MAX_BATCH_SIZE)]):
+    identifier_index.load()
+    return [identifier_index.resolve(key) for key in keys]
@@ -0,0 +1,215 @@
+import re
+from typing import Annotated
+
+from fastapi import HTTPException, Query
+from pydantic import BaseModel
+from sqlalchemy import Connection, event, text
+from sqlmodel import SQLModel
+
+from tcgindex.database import get_engine
+
+FTS_TABLE = "name_search"
+
+# Every indexed name lives in one FTS5 table so that bm25 scores are comparable
+# across sources. The rowid encodes the source row as id * KIND_SLOTS + kind.
+KIND_SLOTS = 8
+SOURCES = {
+    "localized_card_name": 1,
+    "card_representation": 2,
+    "proto_card": 3,
+    "localized_set_name": 4,
+    "set_representation": 5,
+}
+LOCALIZED_SOURCES = {"localized_card_name", "localized_set_name"}
+CARD_KINDS = (1, 2, 3)
+SET_KINDS = (4, 5)
+# prefix indexes answer prefixes of these lengths from a single index lookup,
+# instead of reading the doclists of every term starting with them
+PREFIX_INDEXES = "2 3"
+# shorter last tokens are matched as whole words, a one letter prefix matches
+# a large part of the table
+MIN_PREFIX_LENGTH = 2
+# only the best ranked hits are joined to their rows, per requested result
+HITS_PER_RESULT = 20
+
+
+class CardSearchResult(BaseModel):
+    card_representation_id: int
+    set_representation_id: int
+    proto_card_id: int
+    game_id: int
+    name: str
+    locale: str | None
+    score: float
+
+
+class SetSearchResult(BaseModel):
+    set_representation_id: int
+    catalog_id: int
+    proto_set_id: int
+    game_id: int
+    name: str
+    locale: str | None
+    score: float
+
+
+def ddl_statements() -> list[str]:
+    statements = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "name, locale UNINDEXED, tokenize='unicode61 remove_diacritics 2', "
+        f"prefix='{PREFIX_INDEXES}')"
+    ]
+    for table, kind in SOURCES.items():
+        localized = table in LOCALIZED_SOURCES
+        rowid = f"id * {KIND_SLOTS} + {kind}"
+        insert = (
+            f"INSERT INTO {FTS_TABLE}(rowid, name, locale) VALUES "
+            f"(new.{rowid}, new.name, {'new.locale' if localized else 'NULL'});"
+        )
+        delete = f"DELETE FROM {FTS_TABLE} WHERE rowid = old.{rowid};"
+        columns = "name, locale" if localized else "name"
+        statements += [
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_{table}_insert "
+            f"AFTER INSERT ON {table} BEGIN {insert} END",
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_{table}_update "
+            f"AFTER UPDATE OF {columns} ON {table} BEGIN {delete} {insert} END",
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_{table}_delete "
+            f"AFTER DELETE ON {table} BEGIN {delete} END",
+        ]
+    return statements
+
+
+def install(connection: Connection):
+    """Create the search table and its triggers, filling it if it is new."""
+    existing = connection.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+    ).scalar()
+    if existing is not None and "prefix=" not in existing:
+        # created before the prefix indexes, they can only be added by
+        # creating the table again
+        connection.exec_driver_sql(f"DROP TABLE {FTS_TABLE}")
+        existing = None
+    for statement in ddl_statements():
+        connection.exec_driver_sql(statement)
+    if existing is None:
+        rebuild(connection)
+
+
+def rebuild(connection: Connection):
+    connection.exec_driver_sql(f"DELETE FROM {FTS_TABLE}")
+    for table, kind in SOURCES.items():
+        locale = "locale" if table in LOCALIZED_SOURCES else "NULL"
+        connection.exec_driver_sql(
+            f"INSERT INTO {FTS_TABLE}(rowid, name, locale) "
+            f"SELECT id * {KIND_SLOTS} + {kind}, name, {locale} FROM {table}"
+        )
+
+
+@event.listens_for(SQLModel.metadata, "after_create")
+def create_search_table(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        install(connection)
+
+
+def match_expression(q: str) -> str:
+    # quote every token so user input cannot inject FTS5 query syntax, and
+    # treat the last one as a prefix to support search-as-you-type
+    tokens = re.findall(r"\w+", q)
+    if not tokens:
+        raise HTTPException(
+            status_code=422, detail="query contains no searchable terms"
+        )
+    expression = " ".join(f'"{token}"' for token in tokens)
+    if len(tokens[-1]) >= MIN_PREFIX_LENGTH:
+        expression += "*"
+    return expression
+
+
+def hits_query(kinds: tuple[int, ...]) -> str:
+    return f"""
+        SELECT rowid / {KIND_SLOTS} AS source_id, rowid % {KIND_SLOTS} AS kind,
+            name, locale, bm25({FTS_TABLE}) AS score
+        FROM {FTS_TABLE}
+        WHERE {FTS_TABLE} MATCH :query
+            AND rowid % {KIND_SLOTS} IN ({", ".join(map(str, kinds))})
+            AND (:locale IS NULL OR locale = :locale)
+        ORDER BY rank
+        LIMIT :hits
+    """
+
+
+CARD_SEARCH = text(f"""
+    WITH hits AS ({hits_query(CARD_KINDS)}),
+    matches AS (
+        SELECT l.card_representation_id, h.name, h.locale, h.score
+        FROM hits h JOIN localized_card_name l ON l.id = h.source_id
+        WHERE h.kind = {SOURCES["localized_card_name"]}
+        UNION ALL
+        SELECT h.source_id, h.name, h.locale, h.score
+        FROM hits h
+        WHERE h.kind = {SOURCES["card_representation"]}
+        UNION ALL
+        SELECT c.id, h.name, h.locale, h.score
+        FROM hits h JOIN card_representation c ON c.proto_card_id = h.source_id
+        WHERE h.kind = {SOURCES["proto_card"]}
+    )
+    SELECT c.id AS card_representation_id, c.set_representation_id,
+        c.proto_card_id, c.game_id, m.name, m.locale, MIN(m.score) AS score
+    FROM matches m JOIN card_representation c ON c.id = m.card_representation_id
+    WHERE :game_id IS NULL OR c.game_id = :game_id
+    GROUP BY c.id
+    ORDER BY score
+    LIMIT :limit
+    """)
+
+SET_SEARCH = text(f"""
+    WITH hits AS ({hits_query(SET_KINDS)}),
+    matches AS (
+        SELECT l.set_representation_id, h.name, h.locale, h.score
+        FROM hits h JOIN localized_set_name l ON l.id = h.source_id
+        WHERE h.kind = {SOURCES["localized_set_name"]}
+        UNION ALL
+        SELECT h.source_id, h.name, h.locale, h.score
+        FROM hits h
+        WHERE h.kind = {SOURCES["set_representation"]}
+    )
+    SELECT s.id AS set_representation_id, s.catalog_id, s.proto_set_id,
+        p.game_id, m.name, m.locale, MIN(m.score) AS score
+    FROM matches m
+        JOIN set_representation s ON s.id = m.set_representation_id
+        JOIN proto_set p ON p.id = s.proto_set_id
+    WHERE :game_id IS NULL OR p.game_id = :game_id
+    GROUP BY s.id
+    ORDER BY score
+    LIMIT :limit
+    """)
+
+
+def search(statement, q, locale, game_id, limit):
+    parameters = {
+        "query": match_expression(q),
+        "locale": locale,
+        "game_id": game_id,
+        "limit": limit,
+        "hits": limit * HITS_PER_RESULT,
+    }
+    with get_engine().connect() as connection:
+        return connection.execute(statement, parameters).mappings().all()
+
+
+def search_cards(
+    q: Annotated[str, Query(min_length=1)],
+    locale: str | None = None,
+    game_id: int | None = None,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+):
+    return search(CARD_SEARCH, q, locale, game_id, limit)
+
+
+def search_sets(
+    q: Annotated[str, Query(min_length=1)],
+    locale: str | None = None,
+    game_id: int | None = None,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+):
+    return search(SET_SEARCH, q, locale, game_id, limit)
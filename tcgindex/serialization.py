@@ -0,0 +1,55 @@
+import functools
+
+from pydantic import TypeAdapter
+from typing_extensions import TypedDict
+
+from tcgindex.models import PublicModel
+
+
+class RowEncoder:
+    """
+    Encodes row tuples as JSON in the shape of a public model.
+
+    The values are not validated, they are only serialized with a schema that
+    is compiled once per model and column list. The output is the same as
+    model_dump_json of the public model, because both use the same pydantic-core
+    serializers for the field types.
+    """
+
+    def __init__(self, public_model: type[PublicModel], names: tuple[str, ...]):
+        self.names = names
+        fields = public_model.model_fields
+        row = TypedDict(
+            f"{public_model.__name__}Row",
+            {name: fields[name].annotation for name in names},
+        )
+        page = TypedDict(
+            f"{public_model.__name__}RowPage",
+            {"items": list[row], "next_cursor": int | None},
+        )
+        batch = TypedDict(
+            f"{public_model.__name__}RowBatch",
+            {"items": list[row], "missing": list[int]},
+        )
+        self.row_adapter = TypeAdapter(row)
+        self.page_adapter = TypeAdapter(page)
+        self.batch_adapter = TypeAdapter(batch)
+
+    def mapping(self, values) -> dict:
+        return dict(zip(self.names, values))
+
+    def row(self, values) -> bytes:
+        return self.row_adapter.dump_json(self.mapping(values))
+
+    def page(self, rows, next_cursor: int | None) -> bytes:
+        items = [self.mapping(values) for values in rows]
+        return self.page_adapter.dump_json({"items": items, "next_cursor": next_cursor})
+
+    def batch(self, rows, missing: list[int]) -> bytes:
+        items = [self.mapping(values) for values in rows]
+        return self.batch_adapter.dump_json({"items": items, "missing": missing})
+
+
+@functools.lru_cache(maxsize=1024)
+def row_encoder(public_model: type[PublicModel], names: tuple[str, ...]) -> RowEncoder:
+    return RowEncoder(public_model, names)
@@ -0,0 +1,129 @@
+from typing import Annotated
+
+from fastapi import Header, HTTPException
+from sqlalchemy import Connection, event, text
+from sqlmodel import Session, SQLModel, select
+
+from tcgindex import includes
+from tcgindex.cache import CachedResponse
+from tcgindex.database import get_engine
+from tcgindex.etags import make_etag
+from tcgindex.models import SetRepresentation
+
+SNAPSHOT_TABLE = "set_snapshot"
+SNAPSHOT_INCLUDE = ("card_representations.localized_names", "localized_names")
+
+# Each set's encoded tree is stored next to a version. Triggers on every table
+# the tree is read from bump the version and drop the body of the affected
+# sets, the next read rebuilds it. The set of a localized card name is found
+# through its card.
+SET_ID_EXPRESSIONS = {
+    "set_representation": "{row}.id",
+    "localized_set_name": "{row}.set_representation_id",
+    "card_representation": "{row}.set_representation_id",
+    "localized_card_name": (
+        "(SELECT set_representation_id FROM card_representation "
+        "WHERE id = {row}.card_representation_id)"
+    ),
+}
+
+
+def bump(set_id: str) -> str:
+    # NOT EXISTS rather than INSERT OR IGNORE, the conflict clause of an outer
+    # upsert would override the one of the trigger and fail on existing rows
+    return (
+        f"INSERT INTO {SNAPSHOT_TABLE}(set_representation_id, version) "
+        f"SELECT {set_id}, 0 WHERE {set_id} IS NOT NULL AND NOT EXISTS "
+        f"(SELECT 1 FROM {SNAPSHOT_TABLE} WHERE set_representation_id = {set_id}); "
+        f"UPDATE {SNAPSHOT_TABLE} SET version = version + 1, body = NULL, etag = NULL "
+        f"WHERE set_representation_id = {set_id};"
+    )
+
+
+def ddl_statements() -> list[str]:
+    statements = [
+        f"CREATE TABLE IF NOT EXISTS {SNAPSHOT_TABLE} "
+        "(set_representation_id INTEGER PRIMARY KEY, "
+        "version INTEGER NOT NULL DEFAULT 0, body BLOB, etag VARCHAR)"
+    ]
+    for table, expression in SET_ID_EXPRESSIONS.items():
+        new = bump(expression.format(row="new"))
+        old = bump(expression.format(row="old"))
+        for operation, body in (
+            ("insert", new),
+            # a row may have moved to another set
+            ("update", old + " " + new),
+            ("delete", old),
+        ):
+            trigger = f"{SNAPSHOT_TABLE}_{table}_{operation}"
+            # replaced, so databases created with an older body pick it up
+            statements.append(f"DROP TRIGGER IF EXISTS {trigger}")
+            statements.append(
+                f"CREATE TRIGGER {trigger} "
+                f"AFTER {operation.upper()} ON {table} BEGIN {body} END"
+            )
+    return statements
+
+
+def install(connection: Connection):
+    for statement in ddl_statements():
+        connection.exec_driver_sql(statement)
+
+
+@event.listens_for(SQLModel.metadata, "after_create")
+def create_snapshot_table(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        install(connection)
+
+
+def snapshot_model():
+    return includes.build(SetRepresentation, SNAPSHOT_INCLUDE).model
+
+
+def build(session: Session, id: int) -> bytes | None:
+    spec = includes.build(SetRepresentation, SNAPSHOT_INCLUDE)
+    statement = (
+        select(SetRepresentation)
+        .where(SetRepresentation.id == id)
+        .options(*spec.options)
+    )
+    db_instance = session.exec(statement).first()
+    if db_instance is None:
+        return None
+    return spec.model.model_validate(db_instance).model_dump_json().encode()
+
+
+def read_full(id: int, if_none_match: Annotated[str | None, Header()] = None):
+    engine = get_engine()
+    with engine.connect() as connection:
+        row = connection.execute(
+            text(
+                f"SELECT version, body, etag FROM {SNAPSHOT_TABLE} "
+                "WHERE set_representation_id = :id"
+            ),
+            {"id": id},
+        ).first()
+    if row is not None and row.body is not None:
+        return CachedResponse(row.body, row.etag).to_response(if_none_match)
+
+    # the version is read before the tree, so a write that lands in between
+    # makes the store below a no-op instead of saving a stale body
+    version = row.version if row is not None else 0
+    with Session(engine) as session:
+        body = build(session, id)
+    if body is None:
+        raise HTTPException(status_code=404, detail="set_representation not found")
+    etag = make_etag(SNAPSHOT_TABLE, id, version)
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                f"INSERT INTO {SNAPSHOT_TABLE}"
+                "(set_representation_id, version, body, etag) "
+                "VALUES (:id, :version, :body, :etag) "
+                "ON CONFLICT(set_representation_id) DO UPDATE "
+                "SET body = excluded.body, etag = excluded.etag "
+                f"WHERE {SNAPSHOT_TABLE}.version = excluded.version"
+            ),
+            {"id": id, "version": version, "body": body, "etag": etag},
+        )
+    return CachedResponse(body, etag).to_response(if_none_match)
@@ -0,0 +1,20 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from tests.helpers import build_app, close_app, seed
+
+
+@pytest.fixture(params=["sync", "async"])
+def main(request, tmp_path):
+    """The app module on a freshly seeded database, in both database modes."""
+    main = build_app(
+        f"sqlite:///{tmp_path / 'test.db'}", async_mode=request.param == "async"
+    )
+    seed(main)
+    yield main
+    close_app()
+
+
+@pytest.fixture
+def client(main):
+    return TestClient(main.app)
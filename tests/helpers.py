@@ -0,0 +1,81 @@
+"""Apps built on a throwaway database, shared by the tests."""
+
+import importlib
+import sys
+
+from fastapi.testclient import TestClient
+
+from tcgindex import database, datagen
+
+RESOURCES = [
+    "game",
+    "catalog",
+    "proto_set",
+    "set_representation",
+    "localized_set_name",
+    "proto_card",
+    "card_representation",
+    "localized_card_name",
+]
+NAMES = ["Pokémon", "ポケモンカードゲーム", "Glurak-ex ✦", "Ünown “Ω”"]
+
+
+def build_app(url: str, fast_serialization: bool = False, async_mode: bool = False):
+    database.configure_engine(
+        database.Settings(
+            database_url=url,
+            fast_serialization=fast_serialization,
+            async_mode=async_mode,
+            metrics=False,
+        )
+    )
+    # the routes are registered when the module is imported
+    sys.modules.pop("tcgindex.main", None)
+    return importlib.import_module("tcgindex.main")
+
+
+def close_app():
+    sys.modules.pop("tcgindex.main", None)
+    database.get_engine().dispose()
+
+
+def seed(main):
+    main.create_db_and_tables()
+    datagen.write(main.engine, datagen.Scale(games=1, catalogs=2, sets=2, cards=5))
+    client = TestClient(main.app)
+    game_id = client.post("/game", json={"name": NAMES[0]}).json()["id"]
+    catalog_id = client.post("/catalog", json={"name": NAMES[1]}).json()["id"]
+    proto_card_id = client.post(
+        "/proto_card", json={"game_id": game_id, "name": NAMES[2]}
+    ).json()["id"]
+    proto_set_id = client.post(
+        "/proto_set", json={"game_id": game_id, "name": NAMES[3]}
+    ).json()["id"]
+    set_id = client.post(
+        "/set_representation",
+        json={
+            "proto_set_id": proto_set_id,
+            "catalog_id": catalog_id,
+            "name": NAMES[3],
+            "identifier": "Ω1",
+            "size": 1,
+        },
+    ).json()["id"]
+    card_id = client.post(
+        "/card_representation",
+        json={
+            "game_id": game_id,
+            "proto_card_id": proto_card_id,
+            "set_representation_id": set_id,
+            "name": NAMES[2],
+            "identifier": "①",
+        },
+    ).json()["id"]
+    client.post(
+        "/localized_card_name",
+        json={"card_representation_id": card_id, "name": NAMES[1], "locale": "ja"},
+    )
+    client.post(
+        "/localized_set_name",
+        json={"set_representation_id": set_id, "name": NAMES[0], "locale": "fr"},
+    )
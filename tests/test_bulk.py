@@ -0,0 +1,68 @@
+def names(client, resource: str, ids: list[int]) -> list[str]:
+    items = client.post(f"/{resource}/batch_get", json=ids).json()["items"]
+    return [item["name"] for item in items]
+
+
+def some_ids(client, resource: str, n: int) -> list[int]:
+    items = client.get(f"/{resource}", params={"limit": n}).json()["items"]
+    return [item["id"] for item in items]
+
+
+def test_bulk_update(client):
+    ids = some_ids(client, "proto_card", 3)
+    response = client.patch(
+        "/proto_card/bulk", json={"ids": ids, "patch": {"name": "renamed"}}
+    )
+    assert response.status_code == 200, response.text
+    assert response.json() == {"updated": 3}
+    assert names(client, "proto_card", ids) == ["renamed"] * 3
+
+
+def test_bulk_update_with_missing_id_changes_nothing(client):
+    ids = some_ids(client, "proto_card", 3)
+    before = names(client, "proto_card", ids)
+    response = client.patch(
+        "/proto_card/bulk", json={"ids": ids + [10**9], "patch": {"name": "renamed"}}
+    )
+    assert response.status_code == 404
+    assert response.json()["detail"]["missing"] == [10**9]
+    assert names(client, "proto_card", ids) == before
+
+
+def test_bulk_update_violating_a_constraint_changes_nothing(client):
+    ids = some_ids(client, "catalog", 2)
+    before = names(client, "catalog", ids)
+    # catalog names are unique, two rows cannot take the same one
+    response = client.patch(
+        "/catalog/bulk", json={"ids": ids, "patch": {"name": "same"}}
+    )
+    assert response.status_code == 409
+    assert names(client, "catalog", ids) == before
+
+
+def test_bulk_delete(client):
+    ids = some_ids(client, "localized_card_name", 3)
+    response = client.request("DELETE", "/localized_card_name/bulk", json=ids)
+    assert response.status_code == 200, response.text
+    assert response.json() == {"deleted": 3}
+    batch = client.post("/localized_card_name/batch_get", json=ids).json()
+    assert batch["missing"] == ids
+
+
+def test_bulk_delete_with_missing_id_deletes_nothing(client):
+    ids = some_ids(client, "localized_card_name", 3)
+    response = client.request("DELETE", "/localized_card_name/bulk", json=ids + [10**9])
+    assert response.status_code == 404
+    batch = client.post("/localized_card_name/batch_get", json=ids).json()
+    assert batch["missing"] == []
+
+
+def test_bulk_delete_of_referenced_rows_deletes_nothing(client):
+    card = client.get("/localized_card_name", params={"limit": 1}).json()["items"][0]
+    leaf = client.get("/card_representation", params={"limit": 1000}).json()["items"]
+    ids = [card["card_representation_id"]] + [leaf[-1]["id"]]
+    response = client.request("DELETE", "/card_representation/bulk", json=ids)
+    assert response.status_code == 409
+    assert "localized_card_name" in response.json()["detail"]
+    batch = client.post("/card_representation/batch_get", json=ids).json()
+    assert batch["missing"] == []
@@ -0,0 +1,73 @@
+def total(client, name: str) -> int:
+    return int(client.head(f"/{name}").headers["x-total-count"])
+
+
+def subtree(client, set_id: int) -> dict[str, list[int]]:
+    cards = client.get(
+        "/card_representation",
+        params={"set_representation_id": set_id, "limit": 1000},
+    ).json()["items"]
+    card_ids = [card["id"] for card in cards]
+    names = client.get(
+        "/localized_card_name",
+        params={"card_representation_id": card_ids, "limit": 1000},
+    ).json()["items"]
+    set_names = client.get(
+        "/localized_set_name", params={"set_representation_id": set_id}
+    ).json()["items"]
+    return {
+        "set_representation": [set_id],
+        "card_representation": card_ids,
+        "localized_card_name": [name["id"] for name in names],
+        "localized_set_name": [name["id"] for name in set_names],
+    }
+
+
+def test_cascade_dry_run_counts_without_deleting(client):
+    set_id = client.get("/set_representation", params={"limit": 1}).json()["items"][0][
+        "id"
+    ]
+    expected = {table: len(ids) for table, ids in subtree(client, set_id).items()}
+    before = {table: total(client, table) for table in expected}
+
+    response = client.request(
+        "DELETE",
+        "/set_representation/cascade",
+        params={"dry_run": "true"},
+        json=[set_id],
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["dry_run"] is True
+    counts = response.json()["deleted"]
+    assert {table: counts.get(table, 0) for table in expected} == expected
+    assert {table: total(client, table) for table in expected} == before
+
+
+def test_cascade_deletes_the_subtree(client):
+    set_id = client.get("/set_representation", params={"limit": 1}).json()["items"][0][
+        "id"
+    ]
+    rows = subtree(client, set_id)
+    before = {table: total(client, table) for table in rows}
+
+    response = client.request("DELETE", "/set_representation/cascade", json=[set_id])
+    assert response.status_code == 200, response.text
+    counts = response.json()["deleted"]
+    for table, ids in rows.items():
+        assert counts.get(table, 0) == len(ids)
+        assert total(client, table) == before[table] - len(ids)
+        if ids:
+            batch = client.post(f"/{table}/batch_get", json=ids).json()
+            assert batch["missing"] == ids
+
+
+def test_cascade_with_missing_id_deletes_nothing(client):
+    set_id = client.get("/set_representation", params={"limit": 1}).json()["items"][0][
+        "id"
+    ]
+    response = client.request(
+        "DELETE", "/set_representation/cascade", json=[set_id, 10**9]
+    )
+    assert response.status_code == 404
+    assert response.json()["detail"]["missing"] == [10**9]
+    assert client.get(f"/set_representation/{set_id}").status_code == 200
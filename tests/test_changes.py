@@ -0,0 +1,84 @@
+import json
+
+
+def latest(client, path: str) -> int:
+    page = client.get(path, params={"since": 0, "limit": 1000})
+    while page.json()["has_more"]:
+        cursor = page.json()["cursor"]
+        page = client.get(path, params={"since": cursor, "limit": 1000})
+    return page.json()["cursor"]
+
+
+def test_feed_reports_writes_once_with_tombstones(client):
+    since = latest(client, "/proto_card/changes")
+    game_id = client.get("/game", params={"limit": 1}).json()["items"][0]["id"]
+    created = client.post("/proto_card", json={"game_id": game_id, "name": "new"})
+    created_id = created.json()["id"]
+    updated_id = client.get("/proto_card", params={"limit": 1}).json()["items"][0]["id"]
+    client.patch(f"/proto_card/{updated_id}", json={"name": "patched"})
+    client.patch(f"/proto_card/{created_id}", json={"name": "patched again"})
+    deleted = client.post("/proto_card", json={"game_id": game_id, "name": "gone"})
+    deleted_id = deleted.json()["id"]
+    assert client.delete(f"/proto_card/{deleted_id}").status_code == 200
+
+    page = client.get("/proto_card/changes", params={"since": since}).json()
+    assert not page["has_more"]
+    changes = {item["id"]: item for item in page["items"]}
+    # one entry per row, its latest change
+    assert len(changes) == len(page["items"]) == 3
+    assert changes[created_id]["action"] == "update"
+    assert changes[created_id]["row"]["name"] == "patched again"
+    assert changes[updated_id]["action"] == "update"
+    assert changes[updated_id]["row"]["name"] == "patched"
+    assert changes[deleted_id]["action"] == "delete"
+    assert changes[deleted_id]["row"] is None
+    seqs = [item["seq"] for item in page["items"]]
+    assert seqs == sorted(seqs)
+    assert page["cursor"] == seqs[-1]
+
+    # nothing new after the cursor
+    again = client.get("/proto_card/changes", params={"since": page["cursor"]}).json()
+    assert again["items"] == []
+    assert again["cursor"] == page["cursor"]
+
+
+def test_global_feed_spans_tables(client):
+    since = latest(client, "/changes")
+    name = client.get("/localized_card_name", params={"limit": 1}).json()["items"][0]
+    assert client.delete(f"/localized_card_name/{name['id']}").status_code == 200
+    game = client.post("/game", json={"name": "a new game"}).json()
+
+    items = client.get("/changes", params={"since": since}).json()["items"]
+    assert [(item["table"], item["id"], item["action"]) for item in items] == [
+        ("localized_card_name", name["id"], "delete"),
+        ("game", game["id"], "create"),
+    ]
+
+
+def test_bulk_delete_leaves_tombstones(client):
+    since = latest(client, "/localized_card_name/changes")
+    items = client.get("/localized_card_name", params={"limit": 3}).json()["items"]
+    ids = [item["id"] for item in items]
+    client.request("DELETE", "/localized_card_name/bulk", json=ids)
+
+    page = client.get("/localized_card_name/changes", params={"since": since}).json()
+    assert sorted(item["id"] for item in page["items"]) == sorted(ids)
+    assert {item["action"] for item in page["items"]} == {"delete"}
+
+
+def test_ndjson_feed_matches_pages(client):
+    pages = []
+    since = 0
+    while True:
+        page = client.get(
+            "/card_representation/changes", params={"since": since, "limit": 7}
+        ).json()
+        pages.extend(item["seq"] for item in page["items"])
+        since = page["cursor"]
+        if not page["has_more"]:
+            break
+    stream = client.get(
+        "/card_representation/changes", params={"since": 0, "format": "ndjson"}
+    )
+    lines = [line for line in stream.text.splitlines() if line]
+    assert [json.loads(line)["seq"] for line in lines] == pages
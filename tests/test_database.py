@@ -0,0 +1,9 @@
+import pytest
+
+from tcgindex import database
+
+
+def test_only_sqlite_is_supported():
+    settings = database.Settings(database_url="postgresql://localhost/tcgindex")
+    with pytest.raises(ValueError, match="only sqlite"):
+        database.configure_engine(settings)
@@ -0,0 +1,48 @@
+import pytest
+
+PARENTS = [
+    ("game", "proto_card", "game_id"),
+    ("catalog", "set_representation", "catalog_id"),
+    ("proto_card", "card_representation", "proto_card_id"),
+    ("set_representation", "card_representation", "set_representation_id"),
+    ("card_representation", "localized_card_name", "card_representation_id"),
+]
+
+
+@pytest.mark.parametrize("parent, child, column", PARENTS)
+def test_delete_row_with_children(client, parent, child, column):
+    child_row = client.get(f"/{child}", params={"limit": 1}).json()["items"][0]
+    parent_id = child_row[column]
+    before = client.get(f"/{parent}/{parent_id}").json()
+
+    response = client.delete(f"/{parent}/{parent_id}")
+    assert response.status_code == 409, response.text
+    assert response.json()["detail"].startswith(f"{parent} is still referenced by")
+    assert child in response.json()["detail"]
+    # nothing was deleted, neither the row nor its children
+    assert client.get(f"/{parent}/{parent_id}").json() == before
+    assert client.get(f"/{child}/{child_row['id']}").status_code == 200
+
+
+def test_delete_row_without_children(client):
+    name = client.get("/localized_card_name", params={"limit": 1}).json()["items"][0]
+    response = client.delete(f"/localized_card_name/{name['id']}")
+    assert response.status_code == 200, response.text
+    assert response.json() == name
+    assert client.get(f"/localized_card_name/{name['id']}").status_code == 404
+    assert client.delete(f"/localized_card_name/{name['id']}").status_code == 404
+
+
+def test_delete_after_children(client):
+    card = client.get("/card_representation", params={"limit": 1}).json()["items"][0]
+    names = client.get(
+        "/localized_card_name", params={"card_representation_id": card["id"]}
+    ).json()["items"]
+    if names:
+        ids = [name["id"] for name in names]
+        assert client.request(
+            "DELETE", "/localized_card_name/bulk", json=ids
+        ).is_success
+    response = client.delete(f"/card_representation/{card['id']}")
+    assert response.status_code == 200, response.text
+    assert response.json() == card
@@ -0,0 +1,73 @@
+"""
+The fast serialization path encodes row tuples without the public models, so
+every response it produces must be byte for byte the one the models produce.
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from tests.helpers import NAMES, RESOURCES, build_app, close_app, seed
+
+
+def requests(client: TestClient):
+    for name in RESOURCES:
+        page = client.get(f"/{name}", params={"limit": 1000}).json()
+        ids = [item["id"] for item in page["items"]]
+        assert ids
+        yield "get", f"/{name}", {"limit": 1000}
+        yield "get", f"/{name}", {"limit": 3, "after": ids[1]}
+        yield "get", f"/{name}", {"fields": "id,name"}
+        yield "get", f"/{name}/{ids[-1]}", {}
+        yield "get", f"/{name}/{ids[0]}", {"fields": "name"}
+        yield "post", f"/{name}/batch_get", [ids[-1], ids[0], 10**9]
+        yield "get", f"/{name}/export", {"format": "ndjson"}
+        yield "get", f"/{name}/export", {"format": "json"}
+        yield "get", f"/{name}/export", {"format": "json", "fields": "id,name"}
+
+
+def responses(main):
+    client = TestClient(main.app)
+    collected = {}
+    for method, path, arguments in requests(client):
+        if method == "get":
+            response = client.get(path, params=arguments)
+        else:
+            response = client.post(path, json=arguments)
+        assert response.status_code == 200, (path, response.text)
+        key = (method, path, repr(arguments))
+        collected[key] = (response.content, response.headers.get("ETag"))
+    return collected
+
+
+@pytest.fixture(scope="module")
+def both_modes(tmp_path_factory):
+    url = f"sqlite:///{tmp_path_factory.mktemp('db') / 'test.db'}"
+    try:
+        main = build_app(url, fast_serialization=False)
+        seed(main)
+        slow = responses(main)
+        fast = responses(build_app(url, fast_serialization=True))
+    finally:
+        close_app()
+    return slow, fast
+
+
+def test_same_requests(both_modes):
+    slow, fast = both_modes
+    assert slow.keys() == fast.keys()
+
+
+@pytest.mark.parametrize("name", RESOURCES)
+def test_identical_bytes_and_etags(both_modes, name):
+    slow, fast = both_modes
+    keys = [key for key in slow if key[1].split("/")[1] == name]
+    assert keys
+    for key in keys:
+        assert fast[key] == slow[key], key
+
+
+def test_non_ascii_names_are_not_escaped(both_modes):
+    slow, fast = both_modes
+    for responses in (slow, fast):
+        body = responses[("get", "/game", repr({"limit": 1000}))][0]
+        assert NAMES[0].encode() in body
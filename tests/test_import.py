@@ -0,0 +1,69 @@
+import json
+
+RECORDS = [
+    {
+        "type": "set",
+        "game": "Pokémon",
+        "catalog": "tcgplayer",
+        "identifier": "OBF",
+        "name": "Obsidian Flames",
+        "size": 230,
+        "localized_names": {"fr": "Flammes Obsidiennes"},
+    },
+    {
+        "type": "card",
+        "game": "Pokémon",
+        "catalog": "tcgplayer",
+        "set": "OBF",
+        "identifier": "125",
+        "name": "Charizard ex",
+        "localized_names": {"de": "Glurak-ex"},
+    },
+]
+
+
+def dump(records) -> str:
+    return "".join(json.dumps(record) + "\n" for record in records)
+
+
+def total(client, name: str) -> int:
+    return int(client.head(f"/{name}").headers["x-total-count"])
+
+
+def imported_set(client) -> int:
+    sets = client.get("/set_representation", params={"identifier": "OBF"}).json()
+    return sets["items"][0]["id"]
+
+
+def test_import_twice(client):
+    first = client.post("/import", content=dump(RECORDS))
+    assert first.status_code == 200, first.text
+    counts = {
+        name: total(client, name)
+        for name in ("set_representation", "card_representation", "localized_card_name")
+    }
+    # the snapshot rows of the set exist, and reading it stores a body the
+    # second import has to drop
+    full = client.get(f"/set_representation/{imported_set(client)}/full")
+    assert full.status_code == 200
+
+    second = client.post("/import", content=dump(RECORDS))
+    assert second.status_code == 200, second.text
+    assert second.json()["card_representations"] == first.json()["card_representations"]
+    for name, count in counts.items():
+        assert total(client, name) == count
+
+
+def test_import_updates_existing_rows(client):
+    assert client.post("/import", content=dump(RECORDS)).status_code == 200
+    renamed = [dict(RECORDS[0]), dict(RECORDS[1], name="Charizard ex 125/197")]
+    response = client.post("/import", content=dump(renamed))
+    assert response.status_code == 200, response.text
+    cards = client.get("/card_representation", params={"identifier": "125"}).json()
+    names = [card["name"] for card in cards["items"]]
+    assert "Charizard ex 125/197" in names
+    assert "Charizard ex" not in names
+    full = client.get(f"/set_representation/{imported_set(client)}/full").json()
+    assert "Charizard ex 125/197" in [
+        card["name"] for card in full["card_representations"]
+    ]
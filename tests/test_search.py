@@ -0,0 +1,60 @@
+from sqlalchemy import text
+
+from tcgindex import search
+
+
+def add_card(client, name: str) -> int:
+    card = client.get("/card_representation", params={"limit": 1}).json()["items"][0]
+    fields = {key: value for key, value in card.items() if key != "id"}
+    created = client.post(
+        "/card_representation", json=dict(fields, name=name, identifier=name)
+    )
+    assert created.status_code == 200, created.text
+    return created.json()["id"]
+
+
+def found(client, q: str, **params) -> list[int]:
+    response = client.get("/search/cards", params={"q": q, **params})
+    assert response.status_code == 200, response.text
+    return [hit["card_representation_id"] for hit in response.json()]
+
+
+def test_prefix_search(client):
+    card_id = add_card(client, "Glurak-ex")
+    assert card_id in found(client, "glu")
+    assert card_id in found(client, "gl")
+    assert card_id in found(client, "glurak ex")
+    assert card_id not in found(client, "glx")
+
+
+def test_one_letter_token_matches_whole_words(client):
+    card_id = add_card(client, "Mew X")
+    other_id = add_card(client, "Mew Xerneas")
+    assert card_id in found(client, "mew x")
+    assert other_id not in found(client, "mew x")
+    assert other_id in found(client, "mew xe")
+
+
+def test_limit_with_many_hits(client):
+    ids = {add_card(client, f"Pikachu {number}") for number in range(30)}
+    hits = found(client, "pika", limit=2)
+    assert len(hits) == 2
+    assert set(hits) <= ids
+
+
+def test_table_without_prefix_indexes_is_rebuilt(main):
+    with main.engine.begin() as connection:
+        connection.exec_driver_sql(f"DROP TABLE {search.FTS_TABLE}")
+        connection.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE {search.FTS_TABLE} USING fts5(name, locale UNINDEXED)"
+        )
+        search.install(connection)
+        sql = connection.execute(
+            text("SELECT sql FROM sqlite_master WHERE name = :name"),
+            {"name": search.FTS_TABLE},
+        ).scalar()
+        rows = connection.execute(
+            text(f"SELECT count(*) FROM {search.FTS_TABLE}")
+        ).scalar()
+    assert f"prefix='{search.PREFIX_INDEXES}'" in sql
+    assert rows > 0